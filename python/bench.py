@@ -0,0 +1,158 @@
+import json
+import os
+import platform
+import time
+import tracemalloc
+import numpy as np
+
+from util import rotate, angle_2d, rotate_batch, rotation_matrix, angle_2d_batch, LighthouseRing
+import variation_1
+import variation_2
+from cache import DEFAULT_DIRECTORY
+
+# Kept next to the darkness cache rather than in the working directory, as it is machine-specific.
+HISTORY_PATH = os.path.join(DEFAULT_DIRECTORY, "bench_history.jsonl")
+
+
+def bench_rotate(N):
+  ring = LighthouseRing(N)
+  return lambda: [rotate((0.0, 0.0), c, 0.1) for c in ring.center]
+
+
+def bench_angle_2d(N):
+  ring = LighthouseRing(N)
+  return lambda: [angle_2d((0.0, 0.0), c, l) for c, l in zip(ring.center, ring.left)]
+
+
+def bench_rotate_batch(N):
+  ring = LighthouseRing(N)
+  matrix = rotation_matrix(0.1)
+  out = np.empty_like(ring.center)
+  return lambda: rotate_batch((0.0, 0.0), ring.center, matrix, out=out)
+
+
+def bench_angle_2d_batch(N):
+  ring = LighthouseRing(N)
+  out = np.empty(N)
+  return lambda: angle_2d_batch((0.0, 0.0), ring.center, ring.left, out=out)
+
+
+def bench_checkCollision(N):
+  ring = LighthouseRing(N)
+  return lambda: [variation_2.checkCollision(0.0, 1.0, N, 1.0, c[0], c[1], 1.0) for c in ring.center]
+
+
+def bench_first_illumination_line_1(N):
+  ring = LighthouseRing(N, half=True)
+  return lambda: variation_1.get_first_illumination_line(ring, (0.0, 0.0))
+
+
+def bench_first_illumination_line_2(N):
+  ring = LighthouseRing(N, half=True)
+  return lambda: variation_2.get_first_illumination_line(ring)
+
+
+# Each benchmark takes N and returns the function to time. Primitives are called once per lighthouse of the ring, and
+# their batch kernels once on the whole ring.
+BENCHMARKS = {
+    'util.rotate': bench_rotate,
+    'util.angle_2d': bench_angle_2d,
+    'util.rotate_batch': bench_rotate_batch,
+    'util.angle_2d_batch': bench_angle_2d_batch,
+    'variation_2.checkCollision': bench_checkCollision,
+    'variation_1.get_first_illumination_line': bench_first_illumination_line_1,
+    'variation_2.get_first_illumination_line': bench_first_illumination_line_2,
+    'variation_1.compute_darkness': lambda N: lambda: variation_1.compute_darkness(N, print_res=False),
+    'variation_2.compute_darkness': lambda N: lambda: variation_2.compute_darkness(N, print_res=False),
+    'variation_1.compute_darkness_batch': lambda N: lambda: variation_1.compute_darkness_batch(np.arange(1, N + 1)),
+}
+
+
+def measure(fn, repeat=3):
+  """
+  Best wall time of repeat calls of fn, and the peak memory allocated during a separate call.
+  """
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    times.append(time.perf_counter() - start)
+  tracemalloc.start()
+  fn()
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return min(times), peak
+
+
+def scaling_exponent(N_L, times):
+  """
+  Slope of log(time) against log(N), e.g. 1 for linear and 2 for quadratic scaling.
+  """
+  return float(np.polyfit(np.log(N_L), np.log(times), 1)[0])
+
+
+def run(N_L=np.logspace(1, 5, 9).astype(int), names=None, repeat=3):
+  """
+  Run the benchmarks over the lighthouse counts in N_L.
+
+  Returns a record with the machine, the time, and per benchmark the time, throughput (N per second), peak memory
+  (bytes) for each N and the scaling exponent.
+  """
+  results = {}
+  for name in names or BENCHMARKS:
+    rows = []
+    for N in N_L:
+      seconds, peak = measure(BENCHMARKS[name](int(N)), repeat)
+      rows.append({'N': int(N), 'seconds': seconds, 'throughput': N / seconds, 'peak_memory': peak})
+    results[name] = {'runs': rows, 'exponent': scaling_exponent([r['N'] for r in rows], [r['seconds'] for r in rows])}
+  return {'machine': platform.node() + "/" + platform.machine(), 'time': time.time(), 'results': results}
+
+
+def compare(record, previous, threshold=0.2):
+  """
+  Find the benchmarks that got more than threshold slower than in a previous record.
+
+  Returns a list of (name, N, previous seconds, seconds).
+  """
+  regressions = []
+  for name, result in record['results'].items():
+    before = {r['N']: r['seconds'] for r in previous['results'].get(name, {'runs': []})['runs']}
+    for r in result['runs']:
+      if r['N'] in before and r['seconds'] > (1 + threshold) * before[r['N']]:
+        regressions.append((name, r['N'], before[r['N']], r['seconds']))
+  return regressions
+
+
+def load_history(path=HISTORY_PATH, machine=None):
+  """
+  Load the recorded benchmark runs, optionally only those of a given machine.
+  """
+  if not os.path.exists(path):
+    return []
+  with open(path) as f:
+    history = [json.loads(line) for line in f if line.strip()]
+  return [h for h in history if machine is None or h['machine'] == machine]
+
+
+def save(record, path=HISTORY_PATH):
+  os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+  with open(path, 'a') as f:
+    f.write(json.dumps(record) + "\n")
+
+
+def print_record(record):
+  for name, result in record['results'].items():
+    print(name, "(scaling exponent %.2f)" % result['exponent'])
+    for r in result['runs']:
+      print("  N = %8d: %10.6f s, %12.1f N/s, %10d bytes peak" %
+            (r['N'], r['seconds'], r['throughput'], r['peak_memory']))
+
+
+if __name__ == "__main__":
+  record = run()
+  print_record(record)
+  history = load_history(machine=record['machine'])
+  if history:
+    for name, N, before, after in compare(record, history[-1]):
+      print("REGRESSION: %s at N = %d went from %.6f s to %.6f s" % (name, N, before, after))
+  save(record)
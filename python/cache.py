@@ -0,0 +1,110 @@
+import os
+import glob
+import numpy as np
+
+from precision import get_backend
+
+# Bump this whenever the geometry changes the results, so that older cache files are dropped.
+GEOMETRY_VERSION = 3
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "lighthouse-problem")
+
+
+def record_dtype(mode):
+  """
+  The record of a numeric mode, whose values are stored without losing precision: as float64 for 'float64' and 'auto',
+  as np.longdouble for 'longdouble', and for 'mpmath' as the decimal strings of mpmath's repr, which read back to the
+  same mpf.
+  """
+  value = {'longdouble': np.longdouble, 'mpmath': 'S48'}.get(mode, 'f8')
+  return np.dtype([('N', 'i8'), ('DA', value), ('source', 'i8'), ('tangent', value, (2,)), ('cross_x', value)])
+
+
+# One record per slot. N = 0 marks an empty slot, as there is always at least one lighthouse.
+RECORD = record_dtype('float64')
+
+
+def backend(mode):
+  return get_backend('float64' if mode == 'auto' else mode)
+
+
+def store(value, mode):
+  """
+  A value of a solve_darkness record as stored for mode (see record_dtype).
+  """
+  value = backend(mode).num(value)
+  if mode == 'mpmath':
+    from mpmath import libmp
+    return value.context.nstr(value, libmp.repr_dps(value.context.prec), strip_zeros=False)
+  return value
+
+
+def load(value, mode):
+  """
+  A stored value back as the type mode gives (see precision.refine).
+  """
+  return backend(mode).num(value.decode() if mode == 'mpmath' else value)
+
+
+class DarknessCache:
+  """
+  Persistent cache of solve_darkness results, keyed by variation, N and numeric mode.
+
+  Each (variation, mode) pair has a memory-mapped .npy file of capacity records, and N is stored in slot N % capacity,
+  so lookups are O(1) and read the record in place. A new N evicts whatever was in its slot before. File names carry
+  GEOMETRY_VERSION, and files of other versions are deleted when opened.
+  """
+
+  def __init__(self, directory=DEFAULT_DIRECTORY, capacity=1 << 16):
+    self.directory = directory
+    self.capacity = capacity
+    self.tables = {}
+    os.makedirs(directory, exist_ok=True)
+
+  def path(self, variation, mode, version=GEOMETRY_VERSION):
+    return os.path.join(self.directory, "variation_" + str(variation) + "_" + mode + "_v" + str(version) + ".npy")
+
+  def table(self, variation, mode):
+    """
+    Open (or create) the memory-mapped table of a variation and numeric mode.
+    """
+    key = (variation, mode)
+    if key not in self.tables:
+      path = self.path(variation, mode)
+      for stale in glob.glob(self.path(variation, mode, "*")):
+        if stale != path:
+          os.remove(stale)
+      table = np.lib.format.open_memmap(path, mode='r+') if os.path.exists(path) else None
+      if table is None or table.dtype != record_dtype(mode) or len(table) != self.capacity:
+        del table  # the slots depend on the capacity, so start over
+        table = np.lib.format.open_memmap(path, mode='w+', dtype=record_dtype(mode), shape=(self.capacity,))
+      self.tables[key] = table
+    return self.tables[key]
+
+  def get(self, variation, N, mode='float64'):
+    """
+    Returns the cached (DA, source, tangent, cross_x) record, or None if N is not cached. The values have the type of
+    the mode, as solve_darkness gives them.
+    """
+    record = self.table(variation, mode)[N % self.capacity]
+    if record['N'] != N:
+      return None
+    return (load(record['DA'], mode), int(record['source']), tuple(load(t, mode) for t in record['tangent']),
+            load(record['cross_x'], mode))
+
+  def put(self, variation, N, record, mode='float64'):
+    DA, source, tangent, cross_x = record
+    self.table(variation, mode)[N % self.capacity] = (N, store(DA, mode), source, [store(t, mode) for t in tangent],
+                                                      store(cross_x, mode))
+
+  def flush(self):
+    for table in self.tables.values():
+      table.flush()
+
+  def clear(self):
+    """
+    Delete all cached records.
+    """
+    self.tables = {}
+    for path in glob.glob(os.path.join(self.directory, "variation_*.npy")):
+      os.remove(path)
@@ -0,0 +1,250 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from multiprocessing import Pool
+import numpy as np
+
+from util import IncrementalSolver
+from cache import DarknessCache, DEFAULT_DIRECTORY
+from precision import MODES
+import table
+import export
+import variation_1
+import variation_2
+
+COLUMNS = ['N', 'variation', 'DA', 'theorem_4_3', 'source', 'tangent_x', 'tangent_y', 'cross_x']
+VARIATIONS = {1: variation_1, 2: variation_2}
+
+
+def parse_counts(specs, stdin=sys.stdin):
+  """
+  Lighthouse counts from command line specs, in order. A spec is a count (9), an inclusive range (3:99) or a range
+  with a step (3:99:2). The spec - reads more specs from stdin, separated by whitespace, so counts can be piped in.
+  """
+  counts = []
+  for spec in specs:
+    if spec == '-':
+      counts.extend(parse_counts(stdin.read().split()))
+      continue
+    parts = [int(part) for part in spec.split(':')]
+    if len(parts) == 1:
+      counts.append(parts[0])
+    elif len(parts) in (2, 3):
+      counts.extend(range(parts[0], parts[1] + 1, parts[2] if len(parts) == 3 else 1))
+    else:
+      raise ValueError("Not a lighthouse count or range: " + spec)
+  if any(N < 1 for N in counts):
+    raise ValueError("There has to be at least one lighthouse")
+  return counts
+
+
+def solve_chunk(N_L, variations, mode, cache_directory):
+  """
+  The records of a chunk of lighthouse counts for each of the variations, as dictionaries with the COLUMNS, ordered by
+  N and then variation. The variations are solved incrementally through the chunk, and looked up in and stored to the
+  cache if a directory is given.
+  """
+  cache = DarknessCache(cache_directory) if cache_directory is not None else None
+  solvers = {variation: IncrementalSolver(VARIATIONS[variation].solve_darkness) for variation in variations}
+  rows = []
+  for N in N_L:
+    for variation in variations:
+      record = cache.get(variation, N, mode) if cache is not None else None
+      if record is None:
+        record = solvers[variation](N, mode=mode)
+        if cache is not None:
+          cache.put(variation, N, record, mode)
+      DA, source, tangent, cross_x = record
+      theorem = variation_1.theorem_4_3_formula(N, mode) if variation == 1 else np.nan
+      rows.append({
+          'N': N,
+          'variation': variation,
+          'DA': float(DA),
+          'theorem_4_3': float(theorem),
+          'source': int(source),
+          'tangent_x': float(tangent[0]),
+          'tangent_y': float(tangent[1]),
+          'cross_x': float(cross_x)
+      })
+  return rows
+
+
+def _solve_chunk(args):
+  return solve_chunk(*args)
+
+
+def json_record(row):
+  """
+  A record as strict JSON, which has no non-finite numbers: nan is written as null, and infinities as the strings
+  "Infinity" and "-Infinity" (which float() reads back).
+  """
+
+  def value(v):
+    if isinstance(v, float) and not np.isfinite(v):
+      return None if np.isnan(v) else ("Infinity" if v > 0 else "-Infinity")
+    return v
+
+  return json.dumps({key: value(v) for key, v in row.items()}, allow_nan=False)
+
+
+class Writer:
+  """
+  Writes records to a file in one of FORMATS, flushing after each batch so the output can be piped on as it comes.
+  The JSON formats write records with json_record.
+  """
+  FORMATS = ['csv', 'jsonl', 'json']
+
+  def __init__(self, file, fmt):
+    self.file = file
+    self.fmt = fmt
+    self.count = 0
+    if fmt == 'csv':
+      self.writer = csv.DictWriter(file, COLUMNS, lineterminator='\n')
+      self.writer.writeheader()
+    elif fmt == 'json':
+      file.write('[')
+
+  def write(self, rows):
+    for row in rows:
+      if self.fmt == 'csv':
+        self.writer.writerow(row)
+      elif self.fmt == 'jsonl':
+        self.file.write(json_record(row) + '\n')
+      else:
+        self.file.write((',\n' if self.count > 0 else '\n') + json_record(row))
+      self.count += 1
+    self.file.flush()
+
+  def close(self):
+    if self.fmt == 'json':
+      self.file.write('\n]\n' if self.count > 0 else ']\n')
+    self.file.flush()
+
+
+def darkness(args):
+  N_L = args.N
+  chunks = [
+      (N_L[i:i + args.chunk_size], args.variation, args.mode, args.cache) for i in range(0, len(N_L), args.chunk_size)
+  ]
+  if args.cache is not None:
+    # create the cache files up front, so that the workers do not race to create them
+    cache = DarknessCache(args.cache)
+    for variation in args.variation:
+      cache.table(variation, args.mode)
+  file = open(args.output, 'w', newline='') if args.output is not None else sys.stdout
+  writer = Writer(file, args.format)
+  try:
+    if args.workers > 1 and len(chunks) > 1:
+      with Pool(args.workers) as pool:
+        for rows in pool.imap(_solve_chunk, chunks):
+          writer.write(rows)
+    else:
+      for chunk in chunks:
+        writer.write(_solve_chunk(chunk))
+    writer.close()
+  finally:
+    if file is not sys.stdout:
+      file.close()
+
+
+def draw(args):
+  if args.output is not None:
+    import render
+    lod = 'auto' if args.lod is None else args.lod
+    print(render.render(args.N, args.output, args.variation, scan=not args.match, lod=lod))
+  elif args.match:
+    VARIATIONS[args.variation].draw_match(args.N)
+  else:
+    VARIATIONS[args.variation].draw_all(args.N)
+
+
+def plot(args):
+  VARIATIONS[args.variation].plot_results(args.max)
+
+
+def build(args):
+  print(table.build_table(args.bound, table.DEFAULT_PATH if args.output is None else args.output, args.workers))
+
+
+def export_geometry(args):
+  print(export.export_geometry(args.N, args.output, args.workers))
+
+
+def parser():
+  parser = argparse.ArgumentParser(description="Dark areas of the lighthouse problem.")
+  commands = parser.add_subparsers(dest='command', required=True)
+
+  solve = commands.add_parser('darkness',
+                              help="compute dark areas as records",
+                              description="Compute the dark area, the source lighthouse, the tangent point and the "
+                              "x axis crossing of each N and variation, one record per line.")
+  solve.add_argument('N', nargs='+', help="lighthouse counts: 9, inclusive ranges 3:99 or 3:99:2, or - for stdin")
+  solve.add_argument('-v', '--variation', type=int, nargs='+', choices=[1, 2], default=[1, 2])
+  solve.add_argument('-m', '--mode', choices=MODES, default='float64', help="numeric mode (default float64)")
+  solve.add_argument('-f', '--format', choices=Writer.FORMATS, default='csv', help="output format (default csv)")
+  solve.add_argument('-o', '--output', help="output file (default stdout)")
+  solve.add_argument('-w', '--workers', type=int, default=1, help="processes to solve chunks in (default 1)")
+  solve.add_argument('--chunk-size', type=int, default=256, help="lighthouse counts per chunk (default 256)")
+  solve.add_argument('--cache',
+                     nargs='?',
+                     const=DEFAULT_DIRECTORY,
+                     help="look up and store records in a DarknessCache, in the given directory or the default one")
+  solve.set_defaults(run=darkness)
+
+  show = commands.add_parser('draw',
+                             help="draw a ring",
+                             description="Draw the illumination lines of N lighthouses, as draw_all does, or only "
+                             "the matching one, as draw_match does.")
+  show.add_argument('N', type=int)
+  show.add_argument('-v', '--variation', type=int, choices=[1, 2], default=1)
+  show.add_argument('--match', action='store_true', help="only draw the matching line")
+  show.add_argument('-o', '--output', help="render to this file (png, svg, ...) instead of showing a window")
+  show.add_argument('--lod', type=int, help="neighbors to draw in full detail when rendering (default: render's)")
+  show.set_defaults(run=draw)
+
+  precompute = commands.add_parser('table',
+                                   help="precompute a lookup table",
+                                   description="Precompute the dark areas of N = 1 to bound into a table for "
+                                   "table.DarknessTable.")
+  precompute.add_argument('bound', type=int, help="largest lighthouse count")
+  precompute.add_argument('-o', '--output', default=None, help="table file (default: table.DEFAULT_PATH)")
+  precompute.add_argument('-w', '--workers', type=int, default=None, help="processes (default: one per CPU)")
+  precompute.set_defaults(run=build)
+
+  geometry = commands.add_parser('export',
+                                 help="precompute geometry for the canvas",
+                                 description="Write the rings and the illumination lines of both variations for "
+                                 "each N into a binary file for the web page (see export.py).")
+  geometry.add_argument('N', nargs='+', help="lighthouse counts: 9, inclusive ranges 3:99 or 3:99:2, or - for stdin")
+  geometry.add_argument('-o', '--output', default='geometry.bin', help="output file (default geometry.bin)")
+  geometry.add_argument('-w', '--workers', type=int, default=None, help="processes (default: one per CPU)")
+  geometry.set_defaults(run=export_geometry)
+
+  results = commands.add_parser('plot',
+                                help="plot dark areas against N",
+                                description="Show plot_results of a variation.")
+  results.add_argument('max', type=int, help="largest lighthouse count")
+  results.add_argument('-v', '--variation', type=int, choices=[1, 2], default=1)
+  results.set_defaults(run=plot)
+  return parser
+
+
+def main(argv=None):
+  arguments = parser()
+  args = arguments.parse_args(argv)
+  if args.command in ('darkness', 'export'):
+    try:
+      args.N = parse_counts(args.N)
+    except ValueError as e:
+      arguments.error(str(e))
+  try:
+    args.run(args)
+  except BrokenPipeError:
+    # the reader went away, e.g. head: stop quietly, and keep Python from failing to flush stdout on exit
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,170 @@
+from multiprocessing import Pool
+import numpy as np
+
+from util import rotate_batch, rotation_matrix, angle_2d_batch, dist_2d_batch
+
+
+def perturb(N, members, sigma, R=None, seed=None):
+  """
+  Jittered copies of the ring of N lighthouses of radius R (N by default) around the origin: every coordinate of every
+  center gets Gaussian noise of standard deviation sigma.
+
+  Returns the centers as a (members, N, 2) array.
+  """
+  R = N if R is None else R
+  theta = 2 * np.pi * np.arange(N) / N
+  ring = np.stack([R * np.cos(theta), R * np.sin(theta)], axis=-1)
+  return ring + np.random.default_rng(seed).normal(0.0, sigma, (members, N, 2))
+
+
+def illumination_points(centers, PC=(0.0, 0.0), r=1.0, alpha=None):
+  """
+  The left and right illumination points of lighthouses at arbitrary centers (a (..., N, 2) array), each facing PC
+  with a light angle of alpha degrees (360 / N by default). On a regular ring, these are the left and right points of
+  util.find_lighthouse_illum_points.
+  """
+  N = centers.shape[-2]
+  toward = np.asarray(PC, dtype=float) - centers
+  mid = centers + r * toward / np.hypot(toward[..., 0], toward[..., 1])[..., None]
+  half = np.radians(360.0 / N if alpha is None else alpha) / 2
+  return rotate_batch(centers, mid, rotation_matrix(half)), rotate_batch(centers, mid, rotation_matrix(-half))
+
+
+def find_sources(centers, sign, variation, PC=(0.0, 0.0), r=1.0, alpha=None):
+  """
+  The first valid source of every target of every member, on one side of the target: counter-clockwise if sign is 1,
+  and clockwise if it is -1. centers is a (members, N, 2) array.
+
+  The sources are scanned outwards from the neighbor of each target, as in scan_first_illumination_line of the
+  variations, for all targets at once. On the counter-clockwise side, the tests are those of check_illumination_line:
+  - Variation 1: the tangent from the source center has to be within alpha / 2 of the direction to PC.
+  - Variation 2: the tangent from the left illumination point has to make at least 90 degrees with the center, and the
+    line must not collide with any lighthouse in between.
+  On the clockwise side, they are mirrored: variation 2 uses the right illumination points, and the angles are taken
+  the other way around.
+
+  Returns the offsets of the sources from the targets (-1 where there is none), the points the light comes from and
+  the tangent points, as (members, N), (members, N, 2) and (members, N, 2) arrays.
+  """
+  members, N = centers.shape[:2]
+  spread = np.radians(360.0 / N if alpha is None else alpha) / 2
+  left, right = illumination_points(centers, PC, r, alpha)
+  emitters = centers if variation == 1 else (left if sign > 0 else right)
+  offsets = np.full((members, N), -1, dtype=np.int64)
+  starts = np.full((members, N, 2), np.nan)
+  tangents = np.full((members, N, 2), np.nan)
+  m, t = np.nonzero(np.ones((members, N), dtype=bool))
+  for k in range(1, N // 2 + 1):
+    if len(m) == 0:
+      break
+    s = (t + sign * k) % N
+    start, target = emitters[m, s], centers[m, t]
+    tang = rotate_batch(start, target, rotation_matrix(sign * np.arcsin(r / dist_2d_batch(start, target))))
+    if variation == 1:
+      angle = angle_2d_batch(PC, start, tang) if sign > 0 else angle_2d_batch(tang, start, PC)
+      valid = angle <= spread
+    else:
+      angle = angle_2d_batch(tang, start, centers[m, s]) if sign > 0 else angle_2d_batch(centers[m, s], start, tang)
+      valid = angle >= np.pi / 2
+      if k > 1:
+        # the distance of the lighthouses in between to the line, as in variation_2.checkCollisions
+        between = centers[m[:, None], (t[:, None] + sign * np.arange(1, k)) % N]
+        a, b = start[:, 1] - tang[:, 1], tang[:, 0] - start[:, 0]
+        c = -(b * start[:, 1] + a * start[:, 0])
+        dist = np.abs(a[:, None] * between[..., 0] + b[:, None] * between[..., 1] + c[:, None])
+        valid &= ~(r * np.sqrt(a * a + b * b)[:, None] > dist).any(1)
+    offsets[m[valid], t[valid]] = k
+    starts[m[valid], t[valid]] = start[valid]
+    tangents[m[valid], t[valid]] = tang[valid]
+    m, t = m[~valid], t[~valid]
+  return offsets, starts, tangents
+
+
+def solve_members(centers, variation, PC=(0.0, 0.0), r=1.0, alpha=None):
+  """
+  The dark area behind every target of every member, for a (members, N, 2) array of centers.
+
+  The first valid sources on both sides of a target (see find_sources) give two illumination lines, which cross
+  behind it. The dark area is split along the line from the crossing to the target, and each half is that of
+  Theorem 4.3, (r x - r^2 arctan(x / r)) / 2 for the distance x from the crossing to its tangent point. On a regular
+  ring, both halves are the same, and the dark area of the ring is N times r x - r^2 arctan(x / r), as in the
+  solvers. The dark area is infinite if a side has no valid source, or the lines do not cross behind the target.
+
+  Returns the dark areas as a (members, N) array, and the offsets of the sources on both sides as (members, N, 2).
+  """
+  centers = np.asarray(centers, dtype=float)
+  members, N = centers.shape[:2]
+  if N == 1:
+    return np.zeros((members, 1)), np.full((members, 1, 2), -1, dtype=np.int64)
+  upper, start_u, tang_u = find_sources(centers, 1, variation, PC, r, alpha)
+  lower, start_d, tang_d = find_sources(centers, -1, variation, PC, r, alpha)
+
+  du, dd, w = tang_u - start_u, tang_d - start_d, start_d - start_u
+  det = du[..., 0] * dd[..., 1] - du[..., 1] * dd[..., 0]
+  with np.errstate(divide='ignore', invalid='ignore'):
+    a = (w[..., 0] * dd[..., 1] - w[..., 1] * dd[..., 0]) / det
+    b = (w[..., 0] * du[..., 1] - w[..., 1] * du[..., 0]) / det
+  crossing = start_u + a[..., None] * du
+  x_u = np.hypot(*(crossing - tang_u).transpose(2, 0, 1))
+  x_d = np.hypot(*(crossing - tang_d).transpose(2, 0, 1))
+  areas = (r * x_u - r * r * np.arctan(x_u / r) + r * x_d - r * r * np.arctan(x_d / r)) / 2
+  behind = (a > 0) & (b > 0)  # false where nan too
+  areas = np.where(behind & (upper > 0) & (lower > 0), areas, np.inf)
+  return areas, np.stack([upper, lower], axis=-1)
+
+
+def _solve_members(args):
+  return solve_members(*args)
+
+
+def solve_ensemble(centers, variation, PC=(0.0, 0.0), r=1.0, alpha=None, workers=None, chunk_size=64):
+  """
+  Solve every target of every member of an ensemble of rings, given as a (members, N, 2) array of centers (e.g. from
+  perturb). The lighthouses have radius r and light angle alpha degrees (360 / N by default), and face PC.
+
+  The members are solved in vectorized chunks of chunk_size, over a pool of workers processes if there are several
+  chunks and workers is not 1.
+
+  Returns the total dark area of each member, and the dark areas and source offsets of every target (see
+  solve_members).
+  """
+  centers = np.asarray(centers, dtype=float)
+  chunks = [(centers[i:i + chunk_size], variation, PC, r, alpha) for i in range(0, len(centers), chunk_size)]
+  if workers != 1 and len(chunks) > 1:
+    with Pool(workers) as pool:
+      results = pool.map(_solve_members, chunks)
+  else:
+    results = [_solve_members(chunk) for chunk in chunks]
+  areas = np.concatenate([areas for areas, _ in results])
+  sources = np.concatenate([sources for _, sources in results])
+  return areas.sum(1), areas, sources
+
+
+def summarize(totals):
+  """
+  Summary statistics of the total dark areas of an ensemble. The statistics are over the finite totals, and the
+  fraction of infinite ones is reported apart.
+  """
+  totals = np.asarray(totals, dtype=float)
+  finite = totals[np.isfinite(totals)]
+  stats = {'members': len(totals), 'infinite': float(np.mean(~np.isfinite(totals))) if len(totals) > 0 else 0.0}
+  if len(finite) == 0:
+    return stats
+  p05, p25, median, p75, p95 = (float(p) for p in np.percentile(finite, [5, 25, 50, 75, 95]))
+  stats.update(mean=float(finite.mean()),
+               std=float(finite.std()),
+               min=float(finite.min()),
+               p05=p05,
+               p25=p25,
+               median=median,
+               p75=p75,
+               p95=p95,
+               max=float(finite.max()))
+  return stats
+
+
+if __name__ == "__main__":
+  N = 21
+  for sigma in [0.0, 0.01, 0.1]:
+    totals, _, _ = solve_ensemble(perturb(N, 1000, sigma, seed=0), 2)
+    print("sigma =", sigma, summarize(totals))
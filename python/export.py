@@ -0,0 +1,149 @@
+from multiprocessing import Pool
+import numpy as np
+
+from util import LighthouseRing, find_lighthouse_illum_points, find_crossing
+from cache import GEOMETRY_VERSION
+import variation_1
+import variation_2
+
+# Precomputed geometry for the canvas (src/geometry.js reads it). All numbers are little-endian, and every block starts
+# at a multiple of 8 bytes, so that typed arrays can be laid over the file as it is:
+#   HEADER                 32 bytes
+#   index                  count rows of len(INDEX) float64, one per N, in the order of INDEX
+#   chunks                 per N, at its offset: float32 centers, left and right points, each (N, 2)
+# The lines are those of target 0, from the start point (the center of the source in variation 1 and its left
+# illumination point in variation 2) through the tangent to the crossing on the x axis. The line of the other side is
+# their reflection along the x axis. Where there is no valid source, the source is -1 and the points are nan.
+MAGIC = b"LHGEOM"
+VERSION = 1
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('geometry_version', '<u4'), ('count', '<u4'),
+                   ('fields', '<u4'), ('r', '<f8')])
+LINE_FIELDS = ['DA', 'source', 'start_x', 'start_y', 'tangent_x', 'tangent_y', 'cross_x']
+INDEX = np.dtype([('N', '<f8'), ('offset', '<f8'), ('length', '<f8')] +
+                 [(field + '_' + str(variation), '<f8') for variation in (1, 2) for field in LINE_FIELDS])
+
+
+def chunk_length(N):
+  return 3 * 2 * 4 * N
+
+
+def winning_lines(Ns):
+  """
+  The index rows of an array of lighthouse counts, without the offsets: the dark area, source and illumination line of
+  both variations, by their batch solvers.
+  """
+  N = np.asarray(Ns, dtype=np.int64)
+  Nf = N.astype(float)
+  rows = np.zeros(len(N), dtype=INDEX)
+  rows['N'] = N
+  rows['length'] = chunk_length(N)
+  for variation, module in [(1, variation_1), (2, variation_2)]:
+    DA, sources, tangents = module.compute_darkness_batch(N)
+    theta = 2 * np.pi * sources / Nf
+    starts = np.stack([Nf * np.cos(theta), Nf * np.sin(theta)], axis=-1)
+    if variation == 2:
+      starts = find_lighthouse_illum_points(Nf, starts, (0.0, 0.0), R=Nf[:, None])[:, 0]
+    starts[sources < 0] = np.nan
+    suffix = '_' + str(variation)
+    rows['DA' + suffix], rows['source' + suffix] = DA, sources
+    rows['start_x' + suffix], rows['start_y' + suffix] = starts[:, 0], starts[:, 1]
+    rows['tangent_x' + suffix], rows['tangent_y' + suffix] = tangents[:, 0], tangents[:, 1]
+    rows['cross_x' + suffix] = find_crossing(N, starts, tangents)[0]
+  return rows
+
+
+def ring_chunk(N):
+  """
+  The chunk of N lighthouses: the centers, left and right points, as float32 bytes.
+  """
+  points = LighthouseRing(N).points[:, [0, 1, 3]]
+  return np.ascontiguousarray(points.transpose(1, 0, 2), dtype='<f4').tobytes()
+
+
+def solve_chunk(Ns):
+  return winning_lines(Ns), [ring_chunk(int(N)) for N in Ns]
+
+
+def export_geometry(Ns, path, workers=None, chunk_size=256):
+  """
+  Write the precomputed geometry of the lighthouse counts Ns (duplicates are dropped) to path, in the layout above.
+  Counts are solved in chunks of chunk_size over a pool of workers processes (one per CPU by default, and no pool for
+  1), and written as they come, so only one chunk is in memory at a time.
+
+  Returns the path.
+  """
+  N_L = np.unique(np.asarray(Ns, dtype=np.int64))
+  if len(N_L) == 0 or N_L[0] < 1:
+    raise Exception("There has to be at least one lighthouse")
+  header = np.zeros(1, dtype=HEADER)
+  header['magic'], header['version'], header['geometry_version'] = MAGIC, VERSION, GEOMETRY_VERSION
+  header['count'], header['fields'], header['r'] = len(N_L), len(INDEX.names), 1.0
+  index = np.zeros(len(N_L), dtype=INDEX)
+  lengths = chunk_length(N_L)
+  index['offset'] = HEADER.itemsize + index.nbytes + np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+  chunks = [N_L[i:i + chunk_size] for i in range(0, len(N_L), chunk_size)]
+  with open(path, 'wb') as file:
+    file.write(header.tobytes())
+    file.write(index.tobytes())  # written again once the rows are solved
+    if workers != 1 and len(chunks) > 1:
+      with Pool(workers) as pool:
+        results = pool.imap(solve_chunk, chunks)
+        _write_chunks(file, results, index)
+    else:
+      _write_chunks(file, map(solve_chunk, chunks), index)
+    file.seek(HEADER.itemsize)
+    file.write(index.tobytes())
+  return path
+
+
+def _write_chunks(file, results, index):
+  """
+  Write the rings of the solved chunks in order, and fill their rows into index.
+  """
+  i = 0
+  for rows, blobs in results:
+    offsets = index['offset'][i:i + len(rows)]
+    rows['offset'] = offsets
+    index[i:i + len(rows)] = rows
+    for blob in blobs:
+      file.write(blob)
+    i += len(rows)
+
+
+class GeometryFile:
+  """
+  Reads a file written by export_geometry, memory-mapped, in the same way as the canvas.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.data = np.memmap(path, dtype=np.uint8, mode='r')
+    self.header = self.data[:HEADER.itemsize].view(HEADER)[0]
+    if not bytes(self.header['magic']).startswith(MAGIC) or self.header['version'] != VERSION:
+      raise Exception("Not a geometry file of version " + str(VERSION) + ": " + path)
+    if self.header['fields'] != len(INDEX.names):
+      raise Exception("Unexpected index layout in " + path)
+    end = HEADER.itemsize + int(self.header['count']) * INDEX.itemsize
+    self.index = self.data[HEADER.itemsize:end].view(INDEX)
+    self.rows = {int(N): i for i, N in enumerate(self.index['N'])}
+
+  def record(self, N):
+    """
+    The index row of N lighthouses, with the fields of INDEX.
+    """
+    return self.index[self.rows[N]]
+
+  def ring(self, N):
+    """
+    The centers, left and right points of N lighthouses, as a (3, N, 2) float32 array.
+    """
+    row = self.record(N)
+    offset, length = int(row['offset']), int(row['length'])
+    return self.data[offset:offset + length].view('<f4').reshape(3, N, 2)
+
+
+if __name__ == "__main__":
+  path = export_geometry(range(1, 2001), "geometry.bin")
+  geometry = GeometryFile(path)
+  print(geometry.record(9), geometry.ring(9)[0])
@@ -0,0 +1,142 @@
+import csv
+import importlib
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# (module, function, items) for every instrumented function. items, if given, counts the work a call did from its
+# result and arguments, e.g. the number of circles tested for collision.
+TARGETS = [
+    ('variation_1', 'solve_darkness', None),
+    ('variation_1', 'check_illumination_line', None),
+    ('variation_1', 'find_tangent', None),
+    ('variation_1', 'rotate', None),
+    ('variation_1', 'angle_2d_batch', None),
+    ('variation_1', 'find_crossing', None),
+    ('variation_2', 'solve_darkness', None),
+    ('variation_2', 'check_illumination_line', lambda result, centers_between, *args: len(centers_between)),
+    ('variation_2', 'find_collision_candidates', lambda result, *args: len(result)),
+    ('variation_2', 'checkCollisions', lambda result, *args: len(result)),
+    ('variation_2', 'find_tangent', None),
+    ('variation_2', 'rotate', None),
+    ('variation_2', 'angle_2d_batch', None),
+    ('variation_2', 'find_crossing', None),
+]
+
+# solve_darkness calls are the roots: everything they call is recorded under their N
+ROOT = 'solve_darkness'
+
+stats = defaultdict(lambda: [0, 0.0, 0])  # (N, name) -> [calls, seconds, items]
+events = []
+originals = {}
+state = {'N': None, 'trace': False, 'start': 0.0}
+
+
+def wrap(fn, items, name):
+  """
+  Wrap fn to record its calls, inclusive time and items under the current N and name, and a trace event if tracing.
+  """
+  is_root = name.rsplit(".", 1)[-1] == ROOT
+
+  def wrapper(*args, **kwargs):
+    if is_root:
+      outer_N, state['N'] = state['N'], args[0]
+    result = None
+    start = time.perf_counter()
+    try:
+      result = fn(*args, **kwargs)
+      return result
+    finally:
+      seconds = time.perf_counter() - start
+      stat = stats[(state['N'], name)]
+      stat[0] += 1
+      stat[1] += seconds
+      if items is not None and result is not None:
+        stat[2] += items(result, *args)
+      if state['trace']:
+        events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': (start - state['start']) * 1e6,
+            'dur': seconds * 1e6,
+            'pid': 0,
+            'tid': 0,
+            'args': {
+                'N': state['N']
+            }
+        })
+      if is_root:
+        state['N'] = outer_N
+
+  wrapper.__wrapped__ = fn
+  return wrapper
+
+
+def enable(trace=False):
+  """
+  Start recording, from scratch. The instrumented functions are swapped for recording wrappers in their modules, so
+  nothing is paid while recording is off. Objects holding on to a function from before (e.g. an IncrementalSolver)
+  keep calling the original, so create them after enabling.
+
+  With trace set, every call is also kept as an event for write_chrome_trace.
+  """
+  disable()
+  stats.clear()
+  events.clear()
+  state.update(N=None, trace=trace, start=time.perf_counter())
+  for module_name, function_name, items in TARGETS:
+    module = importlib.import_module(module_name)
+    originals[(module, function_name)] = getattr(module, function_name)
+    # named after where it is patched, not where it is defined, so that e.g. the rotate calls of the two variations
+    # (both util.rotate) are counted apart
+    setattr(module, function_name, wrap(getattr(module, function_name), items, module_name + "." + function_name))
+
+
+def disable():
+  """
+  Stop recording and put the original functions back. The recorded stats are kept.
+  """
+  for (module, function_name), fn in originals.items():
+    setattr(module, function_name, fn)
+  originals.clear()
+
+
+@contextmanager
+def recording(trace=False):
+  enable(trace)
+  try:
+    yield
+  finally:
+    disable()
+
+
+def table():
+  """
+  The recorded stats as a flat table: one row per N and function, with the number of calls, the inclusive time in
+  seconds and the items counted (see TARGETS). For example, the number of check_illumination_line calls under an N is
+  the number of sources tested for it.
+  """
+  rows = [{
+      'N': N,
+      'name': name,
+      'calls': calls,
+      'seconds': seconds,
+      'items': items
+  } for (N, name), (calls, seconds, items) in stats.items()]
+  return sorted(rows, key=lambda row: (-1 if row['N'] is None else row['N'], row['name']))
+
+
+def write_csv(path):
+  with open(path, 'w', newline='') as f:
+    writer = csv.DictWriter(f, ['N', 'name', 'calls', 'seconds', 'items'], lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(table())
+
+
+def write_chrome_trace(path):
+  """
+  Write the traced calls as Chrome trace JSON, to open in chrome://tracing or Perfetto.
+  """
+  with open(path, 'w') as f:
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
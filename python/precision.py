@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+import numpy as np
+
+MODES = ('float64', 'longdouble', 'mpmath', 'auto')
+
+
+def get_backend(mode, dps=30):
+  """
+  Math functions for a numeric mode: 'float64', 'longdouble' (extended precision, where the platform has it) or
+  'mpmath' (arbitrary precision with dps decimal digits, needs the mpmath package).
+  """
+  if mode == 'float64':
+    return SimpleNamespace(num=np.float64,
+                           sin=np.sin,
+                           cos=np.cos,
+                           asin=np.arcsin,
+                           atan=np.arctan,
+                           sqrt=np.sqrt,
+                           pi=np.pi,
+                           eps=np.finfo(np.float64).eps)
+  elif mode == 'longdouble':
+    return SimpleNamespace(num=np.longdouble,
+                           sin=np.sin,
+                           cos=np.cos,
+                           asin=np.arcsin,
+                           atan=np.arctan,
+                           sqrt=np.sqrt,
+                           pi=4 * np.arctan(np.longdouble(1)),
+                           eps=np.finfo(np.longdouble).eps)
+  elif mode == 'mpmath':
+    try:
+      import mpmath
+    except ImportError:
+      raise ImportError("The mpmath mode needs the mpmath package (pip install mpmath)")
+    ctx = mpmath.MPContext()
+    ctx.dps = dps
+    return SimpleNamespace(num=ctx.mpf,
+                           sin=ctx.sin,
+                           cos=ctx.cos,
+                           asin=ctx.asin,
+                           atan=ctx.atan,
+                           sqrt=ctx.sqrt,
+                           pi=ctx.pi,
+                           eps=ctx.eps)
+  raise Exception("Unknown numeric mode: " + str(mode))
+
+
+def to_float64(value):
+  """
+  Round a value of any backend to np.float64. 'auto' mode only aims for a relative error of rtol, far above the float64
+  spacing, so this loses nothing that the escalation gained.
+  """
+  return np.float64(float(value))
+
+
+def cancellation(x):
+  """
+  Condition number of x - arctan(x), which is large for small x as the two terms nearly cancel.
+  """
+  return abs(x / (x - np.arctan(x))) if x != 0 else np.inf
+
+
+def error_bound(N, x, eps):
+  """
+  Rough relative error of a calculated dark area with nugget x. The ring coordinates are of size N while the tangent
+  construction works on differences of size 1, so the geometry loses about N * eps, on top of the cancellation in
+  x - arctan(x). This is calibrated against mpmath to be an overestimate up to N = 10^7.
+  """
+  return eps * N * (1 + cancellation(float(x)))
+
+
+def ring_point(N, i, role, be, config=None):
+  """
+  The center or the left illumination point of lighthouse i out of N, around the origin, in backend be. The ring has
+  the shape of config (a util.RingConfig), or the one of the paper if None.
+  """
+  N = be.num(N)
+  alpha = 2 * be.pi / N
+  if config is None:
+    R, r, light = N, 1, alpha
+  else:
+    R, r, light = be.num(config.R), be.num(config.r), be.num(config.alpha) * be.pi / 180
+  cx, cy = R * be.cos(alpha * i), R * be.sin(alpha * i)
+  if role == 'center':
+    return cx, cy
+  # same as util.find_lighthouse_illum_points
+  dx, dy = -r * cx / R, -r * cy / R
+  return cx + be.cos(light / 2) * dx - be.sin(light / 2) * dy, cy + be.sin(light / 2) * dx + be.cos(light / 2) * dy
+
+
+def solve_crossing(N, source, be, config=None):
+  """
+  The tangent from source to lighthouse 0, and its crossing with the x axis, in backend be. This is find_tangent
+  followed by util.find_crossing.
+
+  Returns the tangent point, the crossing x, the nugget x and the dark area.
+  """
+  R, r = (be.num(N), 1) if config is None else (be.num(config.R), be.num(config.r))
+  N = be.num(N)
+  sx, sy = source
+  dx, dy = R - sx, -sy
+  phi = be.asin(r / be.sqrt(dx * dx + dy * dy))
+  tx, ty = sx + be.cos(phi) * dx - be.sin(phi) * dy, sy + be.sin(phi) * dx + be.cos(phi) * dy
+  if sy - ty <= 0:
+    return (tx, ty), np.nan, np.nan, np.inf
+  cross_x = sx + sy * (tx - sx) / (sy - ty)
+  x = be.sqrt((cross_x - tx)**2 + ty * ty)
+  return (tx, ty), cross_x, x, N * (r * x - r * r * be.atan(x / r))
+
+
+def refine(N, i, role, mode, record, rtol=1e-12, config=None):
+  """
+  Re-evaluate a float64 solve_darkness record for source lighthouse i (whose role point is the light source) in the
+  given mode, on a ring of the shape of config (a util.RingConfig) if given. The source index is discrete, so the
+  float64 search is kept as is.
+
+  In 'auto' mode, the record is only re-evaluated if its error bound is above rtol: first in extended precision, and
+  in mpmath if that is still not enough, with just enough digits for rtol. The result is rounded back to float64
+  either way (see to_float64), so the values have the same type for every N. The other modes give values of their
+  own type: np.float64, np.longdouble or mpmath's mpf.
+  """
+  DA, source, tangent, cross_x = record
+  if mode == 'float64' or not np.isfinite(DA):
+    return record
+  if mode == 'auto':
+    x = np.hypot(cross_x - tangent[0], tangent[1])
+    if error_bound(N, x, get_backend('float64').eps) <= rtol:
+      return record
+    escalated = 'longdouble' if error_bound(N, x, get_backend('longdouble').eps) <= rtol else 'mpmath'
+    dps = int(np.ceil(-np.log10(rtol) + np.log10(N * (1 + cancellation(x))))) + 5
+  else:
+    escalated, dps = mode, 30
+  be = get_backend(escalated, dps)
+  tangent, cross_x, _, DA = solve_crossing(N, ring_point(N, i, role, be, config), be, config)
+  if mode == 'auto':
+    return to_float64(DA), source, (to_float64(tangent[0]), to_float64(tangent[1])), to_float64(cross_x)
+  return DA, source, tangent, cross_x
@@ -0,0 +1,378 @@
+from math import inf
+from multiprocessing import Pool
+import numpy as np
+
+from util import LighthouseRing, RingConfig, find_true_nugget
+import variation_1
+import variation_2
+
+# Points tested at once, and upper bound on the (point, light source, lighthouse) tests held in memory at once.
+TILE = 1024
+BUDGET = 1 << 21
+
+
+def light_sources(ring, variation):
+  """
+  The light sources of a ring, as their positions, owner lighthouses and emission directions.
+
+  In variation 1, the source is the center of each lighthouse, and the direction is the unit vector towards the
+  placement center, the middle of its light angle. In variation 2, the sources are the left and right illumination
+  points, and the direction is the outward normal of the lighthouse there: the light fills the half-plane in front of
+  the tangent.
+  """
+  N = len(ring)
+  if variation == 1:
+    directions = np.asarray(ring.PC, dtype=float) - ring.center
+    directions /= np.hypot(directions[:, 0], directions[:, 1])[:, None]
+    return ring.center, np.arange(N), directions
+  sources = np.concatenate([ring.left, ring.right])
+  normals = sources - np.concatenate([ring.center, ring.center])
+  normals /= np.hypot(normals[:, 0], normals[:, 1])[:, None]
+  return sources, np.concatenate([np.arange(N), np.arange(N)]), normals
+
+
+def ring_ranges(starts, counts, N):
+  """
+  Concatenated ranges of lighthouse indices: counts[k] consecutive indices from starts[k] on, modulo N. Returns the
+  range k of each index, and the indices.
+  """
+  ranges = np.repeat(np.arange(len(counts)), counts)
+  offsets = np.arange(len(ranges)) - np.repeat(np.cumsum(counts) - counts, counts)
+  return ranges, (np.repeat(starts, counts) + offsets) % N
+
+
+def band_arc(ring, sources, phi):
+  """
+  The lighthouse centers within r of the line through each source at angle phi, near the point where the ray leaves
+  the ring, as an arc of angles (lo, hi) around the placement center. As in variation_2.find_collision_candidates, the
+  centers near a line form two arcs, and this is the one around the exit. The sources have to be inside or on the
+  circle of the centers. Also returns the angle of the exit.
+  """
+  R, r = ring.config.R, ring.config.r
+  rel = sources - np.asarray(ring.PC, dtype=float)
+  ux, uy = np.cos(phi), np.sin(phi)
+  b = rel[:, 0] * ux + rel[:, 1] * uy
+  t = -b + np.sqrt(np.maximum(b * b - np.minimum(rel[:, 0]**2 + rel[:, 1]**2 - R * R, 0), 0))
+  leave = np.arctan2(rel[:, 1] + t * uy, rel[:, 0] + t * ux)
+  psi = phi + np.pi / 2  # normal of the line, with signed distance R cos(theta - psi) + c for the center at theta
+  c = rel[:, 0] * uy - rel[:, 1] * ux
+  near, far = np.arccos(np.clip((r - c) / R, -1, 1)), np.arccos(np.clip((-r - c) / R, -1, 1))
+  ahead = np.sin(leave - psi) >= 0
+  return np.where(ahead, psi + near, psi - far), np.where(ahead, psi + far, psi - near), leave
+
+
+def find_occluders(ring, sources, first, last, farthest, wide):
+  """
+  Candidate occluders for the light of each source towards the angles first to last, up to distance farthest, as
+  pairs of source and lighthouse indices ordered by source. This is an angular index of the ring rather than a test of
+  every lighthouse: seen from a point inside the circle of the centers, the centers are in order of angle, so the ones
+  in the way are a run of the ring. The run spans the centers near the two bounding lines (see band_arc) and all those
+  between them. It is widened by one lighthouse on each side to absorb rounding, and may contain lighthouses that do
+  not block anything.
+
+  Sources outside the circle, and the wide ones, get all the lighthouses within farthest + r of them instead.
+  """
+  N, R, r = len(ring), ring.config.R, ring.config.r
+  alpha = 2 * np.pi / N
+  rel = sources - np.asarray(ring.PC, dtype=float)
+  rho = np.hypot(rel[:, 0], rel[:, 1])
+  around = wide | (rho > R * (1 + 1e-12))
+  wrap = lambda angle: (angle + np.pi) % (2 * np.pi) - np.pi
+
+  lo1, hi1, leave1 = band_arc(ring, sources, first)
+  lo2, hi2, leave2 = band_arc(ring, sources, last)
+  sweep = (leave2 - leave1) % (2 * np.pi)  # the exit moves counterclockwise with the angle of the ray
+  sweep[sweep > 2 * np.pi - 1e-9] = 0  # rounding, the two exits are the same
+  lo = leave1 + np.minimum(wrap(lo1 - leave1), sweep + wrap(lo2 - leave2))
+  hi = leave1 + np.maximum(wrap(hi1 - leave1), sweep + wrap(hi2 - leave2))
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    cos_half = (rho * rho + R * R - (farthest + r)**2) / (2 * R * rho)
+  half = np.where(cos_half <= -1, np.pi, np.arccos(np.clip(cos_half, -1, 1)))
+  center = np.arctan2(rel[:, 1], rel[:, 0])
+  lo[around], hi[around] = center[around] - half[around], center[around] + half[around]
+
+  starts = np.floor(lo / alpha).astype(np.int64) - 1
+  counts = np.minimum(np.ceil(hi / alpha).astype(np.int64) + 2 - starts, N)
+  counts[around & (half >= np.pi)] = N
+  return ring_ranges(starts % N, counts, N)
+
+
+def in_view(points, ring, sources, owners, directions, variation):
+  """
+  Cull the light sources and lighthouses for a group of points, using their bounding box as seen from each source.
+
+  Returns a mask of the sources that may light some of the points: their light reaches the box, and the lighthouses in
+  front of the box do not hide all of it. Also returns which lighthouses may block the light of each such source on
+  the way to the points, as pairs of source and lighthouse indices ordered by source: the ones that overlap the box as
+  seen from the source, and are not all behind it. A source never blocks itself. The candidates come from
+  find_occluders, so the cost grows with the number of sources rather than sources times lighthouses.
+
+  The box has to be seen within 90 degrees on either side of its center. Sources seeing it wider, e.g. those inside
+  it, are kept along with all lighthouses near enough to matter.
+  """
+  r = ring.config.r
+  lo, hi = points.min(0), points.max(0)
+  corners = np.array([[lo[0], lo[1]], [hi[0], lo[1]], [lo[0], hi[1]], [hi[0], hi[1]]])
+  sx, sy = sources[:, 0, None], sources[:, 1, None]
+  base = np.arctan2((lo[1] + hi[1]) / 2 - sy, (lo[0] + hi[0]) / 2 - sx)
+  wrap = lambda angle: (angle - base + np.pi) % (2 * np.pi) - np.pi
+  corner_angles = wrap(np.arctan2(corners[:, 1] - sy, corners[:, 0] - sx))
+  first, last = corner_angles.min(1), corner_angles.max(1)
+  wide = np.abs(corner_angles).max(1) >= np.pi / 2
+  farthest = np.hypot(corners[:, 0] - sx, corners[:, 1] - sy).max(1)
+  gap_x = np.maximum(np.maximum(lo[0] - sx[:, 0], sx[:, 0] - hi[0]), 0)
+  gap_y = np.maximum(np.maximum(lo[1] - sy[:, 0], sy[:, 0] - hi[1]), 0)
+  nearest = np.hypot(gap_x, gap_y)
+
+  if variation == 1:
+    light = wrap(np.arctan2(directions[:, 1, None], directions[:, 0, None]))[:, 0]
+    spread = np.radians(ring.config.alpha) / 2
+    reaches = (light - spread < last) & (light + spread > first)
+  else:
+    reaches = ((corners[:, 0] - sx) * directions[:, 0, None] + (corners[:, 1] - sy) * directions[:, 1, None]
+               >= 0).any(1)
+  seen = wide | reaches
+  base = base[:, 0]
+  source, occluder = find_occluders(ring, sources[seen], base[seen] + first[seen], base[seen] + last[seen],
+                                    farthest[seen], wide[seen])
+  source = np.flatnonzero(seen)[source]
+
+  cx, cy = ring.center[occluder, 0] - sources[source, 0], ring.center[occluder, 1] - sources[source, 1]
+  distance = np.hypot(cx, cy)
+  angle = (np.arctan2(cy, cx) - base[source] + np.pi) % (2 * np.pi) - np.pi
+  with np.errstate(divide='ignore', invalid='ignore'):
+    half = np.where(distance > r, np.arcsin(np.minimum(r / distance, 1)), np.pi)
+  overlaps = (angle - half < last[source]) & (angle + half > first[source])
+  relevant = (wide[source] | overlaps) & (distance - r < farthest[source]) & (occluder != owners[source])
+
+  # A source is hidden if the lighthouses in front of the box cover the box between them, as seen from it. A ray
+  # within the angle of a lighthouse meets it before the distance of its center, so the center has to be in front.
+  front = relevant & ~wide[source] & (distance < nearest[source])
+  s, start, end = source[front], (angle - half)[front], (angle + half)[front]
+  order = np.lexsort((start, s))
+  s, start, end = s[order], start[order], end[order]
+  covered = np.maximum.accumulate(end + s * (4 * np.pi)) - s * (4 * np.pi)  # running maximum per source
+  begins = np.diff(s, prepend=-1) != 0
+  before = np.where(begins, first[s], np.roll(covered, 1))
+  gap = (start > before) & (before < last[s])
+  hidden = np.zeros(len(sources), dtype=bool)
+  ends = np.flatnonzero(np.diff(s, append=-1) != 0)
+  hidden[s[ends]] = covered[ends] >= last[s[ends]]
+  hidden[s[gap]] = False
+
+  active = wide | (reaches & ~hidden)
+  keep = relevant & active[source]
+  return active, source[keep], occluder[keep]
+
+
+def inside_lighthouse(points, ring):
+  """
+  Mask of the points inside a lighthouse. A lighthouse spans at most half the angle between two neighbors around the
+  placement center (see RingConfig), so only the three lighthouses nearest in angle to each point are tested.
+  """
+  N, r = len(ring), ring.config.r
+  px, py = points[:, 0] - ring.PC[0], points[:, 1] - ring.PC[1]
+  nearest = np.rint(np.arctan2(py, px) / (2 * np.pi / N)).astype(np.int64)
+  j = (nearest[:, None] + np.array([-1, 0, 1])) % N
+  return ((points[:, 0, None] - ring.center[j, 0])**2 + (points[:, 1, None] - ring.center[j, 1])**2 < r * r).any(1)
+
+
+def illuminated(points, ring, variation, sources=None):
+  """
+  Test which of the points (an (M, 2) array) are lit, by testing light sources against the lighthouses in the way.
+
+  A point is lit if it is in the light of some source (the light angle in variation 1, the half-plane in front of the
+  tangent in variation 2), and the segment from that source to it misses all other lighthouses. Only the sources and
+  lighthouses in view of the points (see in_view) are tested, which is a handful for a small group of points. The
+  sources are those of light_sources, or a subset of them culled in advance.
+
+  Returns the masks of the lit points and of the points inside a lighthouse.
+  """
+  r = ring.config.r
+  px, py = points[:, 0], points[:, 1]
+  cx, cy = ring.center[:, 0], ring.center[:, 1]
+  inside = inside_lighthouse(points, ring)
+  lit = np.zeros(len(points), dtype=bool)
+  if inside.all():
+    return lit, inside
+
+  sources, owners, directions = light_sources(ring, variation) if sources is None else sources
+  active, pair_source, occluders = in_view(points[~inside], ring, sources, owners, directions, variation)
+  sources, owners, directions = sources[active], owners[active], directions[active]
+  sx, sy = sources[:, 0], sources[:, 1]
+  vx, vy = px[:, None] - sx, py[:, None] - sy
+  along = vx * directions[:, 0] + vy * directions[:, 1]
+  if variation == 1:
+    emits = along >= np.cos(np.radians(ring.config.alpha) / 2) * np.hypot(vx, vy)
+  else:
+    emits = along >= 0
+  p_idx, s_idx = np.nonzero(emits & ~inside[:, None])
+  if len(p_idx) == 0:
+    return lit, inside
+
+  counts = np.bincount((np.cumsum(active) - 1)[pair_source], minlength=len(sources))
+  starts = np.cumsum(counts) - counts
+
+  def through(p_idx, s_idx):
+    # every pair of point and source is repeated for each lighthouse in view of the source
+    clear = np.empty(len(p_idx), dtype=bool)
+    step = max(1, BUDGET // max(counts.max(), 1))
+    for i in range(0, len(p_idx), step):
+      n = counts[s_idx[i:i + step]]
+      pair = np.repeat(np.arange(len(n)), n)
+      j = occluders[np.repeat(starts[s_idx[i:i + step]] - (np.cumsum(n) - n), n) + np.arange(len(pair))]
+      p, s = p_idx[i:i + step][pair], s_idx[i:i + step][pair]
+      vx, vy = px[p] - sx[s], py[p] - sy[s]
+      wx, wy = cx[j] - sx[s], cy[j] - sy[s]  # source -> occluder center
+      t = np.clip((wx * vx + wy * vy) / (vx * vx + vy * vy), 0, 1)
+      hit = (wx - t * vx)**2 + (wy - t * vy)**2 < r * r
+      clear[i:i + step] = np.bincount(pair[hit], minlength=len(n)) == 0
+    return clear
+
+  # A lit point is usually lit by most of its sources, so four of them, spread over its pairs, are tried first.
+  first = np.flatnonzero(np.diff(p_idx, prepend=-1))
+  size = np.diff(first, append=len(p_idx))
+  rank, size = np.arange(len(p_idx)) - np.repeat(first, size), np.repeat(size, size)
+  tried = (rank * 4) // size != ((rank - 1) * 4) // size
+  lit[p_idx[tried][through(p_idx[tried], s_idx[tried])]] = True
+  rest = ~tried & ~lit[p_idx]
+  lit[p_idx[rest][through(p_idx[rest], s_idx[rest])]] = True
+  return lit, inside
+
+
+def dark_fraction(cells, size, ring, variation, samples, sources=None):
+  """
+  Fraction of dark samples in each cell, given by their lower left corners and a common size. Each cell is sampled at
+  the centers of a samples x samples grid, and the points are tested in tiles of neighboring cells, of at most TILE
+  points, against the sources (see illuminated).
+  """
+  offsets = (np.arange(samples) + 0.5) * size / samples
+  grid = np.stack(np.meshgrid(offsets, offsets), axis=-1).reshape(-1, 2)
+  order = np.lexsort((cells[:, 1], cells[:, 0]))
+  points = (cells[order][:, None, :] + grid[None]).reshape(-1, 2)
+  dark = np.empty(len(points), dtype=bool)
+  for i in range(0, len(points), TILE):
+    lit, inside = illuminated(points[i:i + TILE], ring, variation, sources)
+    dark[i:i + TILE] = ~lit & ~inside
+  fraction = np.empty(len(cells))
+  fraction[order] = dark.reshape(len(cells), -1).mean(1)
+  return fraction
+
+
+def find_extent(ring, variation, resolution):
+  """
+  How far behind the target lighthouse the dark area reaches: the distance is doubled, starting from its radius, until
+  a vertical line of samples there is all lit. Returns inf if that does not happen within twice the ring radius.
+  """
+  R, r = ring.config.R, ring.config.r
+  y = np.linspace(0, r, 4 * resolution + 1)
+  extent = r
+  while extent <= 2 * R:
+    points = np.stack([np.full_like(y, R + extent), y], axis=-1)
+    lit, inside = illuminated(points, ring, variation)
+    if (lit | inside).all():
+      return extent
+    extent *= 2
+  return inf
+
+
+def near_mixed(keys, mixed):
+  """
+  Mask of the cells, given by their integer grid coordinates, that are mixed or next to a mixed cell.
+  """
+  shifts = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+  around = (keys[mixed][:, None, :] + shifts[None]).reshape(-1, 2)
+  encode = lambda k: k[:, 0] * (1 << 32) + k[:, 1]
+  return np.isin(encode(keys), encode(around))
+
+
+def estimate_darkness(N, variation, config=None, resolution=16, samples=4, depth=8, rtol=1e-2):
+  """
+  Estimate the dark area of N lighthouses by rasterizing the plane behind the target lighthouse, independently of the
+  tangent construction of the solvers. The ring has the shape of config (a RingConfig), or the one of the paper if
+  None.
+
+  The picture is symmetric about the x axis, so only the box from the left edge of the target to the end of its dark
+  area (see find_extent), between y = 0 and r, is rasterized. It is split into cells of size r / resolution. Cells
+  whose samples disagree, and their neighbors, are split in four, down to depth times or until the error bound is
+  within rtol of the area. Each cell contributes its dark fraction of samples.
+
+  The error bound assumes the boundary of the dark area is straight within a cell, so that the samples of a mixed
+  cell misjudge at most 1 / samples of its area, and that cells away from the mixed ones are uniform. Dark features
+  thinner than a cell may still be missed.
+
+  The dark area is the same behind every lighthouse, so the total is N times the one behind the target. Returns the
+  dark area and its error bound, which are inf and 0 if the dark area does not end.
+  """
+  if N == 1:
+    return 0.0, 0.0
+  ring = LighthouseRing(N, config=config)
+  R, r = ring.config.R, ring.config.r
+  extent = find_extent(ring, variation, resolution)
+  if extent == inf:
+    return inf, 0.0
+  # the sources that cannot light any part of the box cannot light any of its tiles either
+  sources = light_sources(ring, variation)
+  active, _, _ = in_view(np.array([[R - r, 0.0], [R + extent, r]]), ring, *sources, variation)
+  sources = tuple(part[active] for part in sources)
+
+  size = r / resolution
+  keys = np.stack(np.meshgrid(np.arange(int(np.ceil((r + extent) / size))), np.arange(resolution)),
+                  axis=-1).reshape(-1, 2)
+  origin = np.array([R - r, 0.0])
+  area = 0.0
+  for level in range(depth + 1):
+    fraction = dark_fraction(origin + keys * size, size, ring, variation, samples, sources)
+    mixed = (fraction > 0) & (fraction < 1)
+    error = mixed.sum() * size * size / samples
+    if level == depth or error <= rtol * (area + fraction.sum() * size * size):
+      return 2 * N * (area + fraction.sum() * size * size), 2 * N * error
+    refine = near_mixed(keys, mixed)
+    area += fraction[~refine].sum() * size * size
+    size /= 2
+    keys = (2 * keys[refine][:, None, :] + np.array([[0, 0], [1, 0], [0, 1], [1, 1]])[None]).reshape(-1, 2)
+
+
+def reference_darkness(N, variation, config=None):
+  """
+  The dark area of the solver of a variation, with the nugget measured up to the true tangent point (see
+  util.find_true_nugget), which is what estimate_darkness estimates. The ring has the shape of config, or the one of
+  the paper if None.
+
+  Both assume that the dark area is one region behind the target lighthouse, cut off by the illumination line of the
+  source. This is not always the case in variation 2. At N = 19, the source is the immediate neighbor, and its light
+  only reaches a little past the crossing, as the rays beyond it leave the half-plane in front of its tangent. Past
+  that, the x axis is dark again up to where the light of lighthouse 3 comes in. estimate_darkness counts this second
+  dark region, and this does not. At N = 58, the right illumination point of lighthouse 6 lights a sliver of the dark
+  area, which the solvers do not consider.
+  """
+  DA, _, _, cross_x = (variation_1 if variation == 1 else variation_2).solve_darkness(N, config=config)
+  if not np.isfinite(cross_x):
+    return DA
+  config = RingConfig(N) if config is None else config
+  return find_true_nugget(N, cross_x, config.R, config.r)[1]
+
+
+def estimate_range(N_L, variation, workers=None, **kwargs):
+  """
+  estimate_darkness for each N in N_L over a pool of processes. The keyword arguments are passed on.
+
+  Returns the dark areas and error bounds as arrays.
+  """
+  with Pool(workers) as pool:
+    results = pool.starmap(_estimate, [(N, variation, kwargs) for N in N_L])
+  DA, error = np.array(results).reshape(-1, 2).T
+  return DA, error
+
+
+def _estimate(N, variation, kwargs):
+  return estimate_darkness(N, variation, **kwargs)
+
+
+if __name__ == "__main__":
+  for N in [9, 19, 20, 21]:
+    DA, error = estimate_darkness(N, 2)
+    print("D(" + str(N) + ") by Calculation:", variation_2.compute_darkness(N, print_res=False))
+    print("D(" + str(N) + ") up to the true tangent:", reference_darkness(N, 2))
+    print("D(" + str(N) + ") by Raster:", DA, "+-", error)
@@ -0,0 +1,142 @@
+import os
+from multiprocessing import Pool
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.patches import Circle
+
+from util import LighthouseRing
+import variation_1
+import variation_2
+
+# Above this many lighthouses, render draws the ring at a lower level of detail by default.
+LOD_THRESHOLD = 200
+
+
+def collect_geometry(N, variation, scan=True, lod=None):
+  """
+  Gather what draw_all (with scan) or draw_match (without) of a variation plots, as arrays.
+
+  With lod set, only the lighthouses within lod of the target or the source are kept in detail (see detail_indices),
+  and only their illumination lines are computed.
+
+  Returns the ring, the illumination lines as a list of (start, tangent, isValid), the solve_darkness record, and the
+  indices of the lighthouses to draw in detail (None for all of them).
+  """
+  ring = LighthouseRing(N)
+  record = (variation_1 if variation == 1 else variation_2).solve_darkness(N)
+  DA, source, tangent, cross_x = record
+  detail = None if lod is None else detail_indices(N, source, lod)
+  lines = []
+  for i in range(1 if scan else max(source, 1), source + 1):
+    if detail is not None and i not in detail:
+      continue
+    if variation == 1:
+      isValid, tang = variation_1.check_illumination_line(ring.center[i], ring.center[0], ring.PC, N)
+      lines.append((ring.center[i], tang, isValid))
+    else:
+      tang = variation_2.find_tangent(ring.left[i], ring.center[0])
+      isValid, tang = variation_2.check_illumination_line(variation_2.centers_between(ring, i, tang), ring.center[i],
+                                                          ring.left[i], ring.center[0], 1.0, tang)
+      lines.append((ring.left[i], tang, isValid))
+  return ring, lines, record, detail
+
+
+def detail_indices(N, source, lod):
+  """
+  Indices of the lighthouses within lod of the target (lighthouse 0) or the source, the only ones where the tangent
+  construction happens.
+  """
+  indices = np.concatenate([np.arange(-lod, lod + 1), np.arange(source - lod, source + lod + 1)]) % N
+  return set(np.unique(indices).tolist())
+
+
+def circle_segments(centers, r=1.0, resolution=64):
+  """
+  Circles of radius r around the centers, as an (N, resolution + 1, 2) array of closed polylines.
+  """
+  t = np.linspace(0, 2 * np.pi, resolution + 1)
+  return centers[:, None, :] + r * np.stack([np.cos(t), np.sin(t)], axis=-1)[None]
+
+
+def draw(ax, N, ring, lines, record, detail=None):
+  """
+  Draw the collected geometry on ax, with one collection per kind of artist instead of one artist per lighthouse.
+
+  If detail is given, only those lighthouses are drawn in full, and the whole ring is drawn as a single thick gray
+  outline beneath them. This keeps the cost of the plot independent of N.
+  """
+  PC = ring.PC
+  if detail is None:
+    center, left, middle, right = ring.center, ring.left, ring.middle, ring.right
+  else:
+    detail = sorted(detail)
+    center, left, middle, right = ring.center[detail], ring.left[detail], ring.middle[detail], ring.right[detail]
+    ax.add_patch(Circle(PC, N, fill=False, color='lightgray', linewidth=4))
+  ax.add_collection(LineCollection(circle_segments(center), colors='black', linewidths=1.0))
+  ax.add_collection(
+      LineCollection(np.stack([center, np.broadcast_to(PC, center.shape)], axis=1),
+                     colors='gray',
+                     linestyles='--',
+                     linewidths=0.4))
+  ax.add_collection(
+      LineCollection(np.concatenate([np.stack([center, left], axis=1),
+                                     np.stack([center, right], axis=1)]),
+                     colors='gray',
+                     linewidths=0.5))
+  ax.scatter(PC[0], PC[1], color="red")
+  ax.scatter(center[:, 0], center[:, 1], color="yellow")
+  illum = np.concatenate([left, right, middle])
+  ax.scatter(illum[:, 0], illum[:, 1], color="gray")
+
+  for isValid, color, style in [(False, 'red', '--'), (True, 'green', '-')]:
+    chosen = [(start, tang) for start, tang, valid in lines if valid == isValid]
+    if chosen:
+      segments = np.array(chosen, dtype=float)
+      ax.add_collection(LineCollection(segments, colors=color, linestyles=style, linewidths=0.5))
+      ends = segments.reshape(-1, 2)
+      ax.scatter(ends[:, 0], ends[:, 1], color=color)
+
+  DA, _, tangent, cross_x = record
+  ax.set_xlim([-N - 1.5, N + 1.5])
+  ax.set_ylim([-N - 1.5, N + 1.5])
+  if np.isfinite(cross_x):
+    ax.scatter(cross_x, 0.0, color="orange")
+    ax.add_collection(
+        LineCollection([[tangent, (cross_x, 0.0)], [center[0], (cross_x, 0.0)]], colors='gray', linewidths=0.5))
+    ax.set_xlim([-N - 1.5, cross_x + 1.5])
+  ax.set_title(str(N) + " lighthouses")
+
+
+def render(N, path, variation=1, scan=True, dpi=100, lod='auto'):
+  """
+  Render the plot of draw_all (with scan) or draw_match (without) of a variation straight to a file, without a GUI.
+  The format follows the extension of path, e.g. png or svg.
+
+  lod is the number of neighbors of the target and the source to draw in full detail, or None to draw every
+  lighthouse. By default, rings of more than LOD_THRESHOLD lighthouses keep 5 neighbors.
+  """
+  if lod == 'auto':
+    lod = 5 if N > LOD_THRESHOLD else None
+  fig = Figure(tight_layout=True)
+  FigureCanvasAgg(fig)
+  draw(fig.add_subplot(), N, *collect_geometry(N, variation, scan, lod))
+  fig.savefig(path, dpi=dpi)
+  return path
+
+
+def render_range(N_L, directory, variation=1, scan=False, fmt='png', workers=None, lod='auto'):
+  """
+  Render a plot for each N in N_L into directory as an image sequence (N_000001.png, ...), over a pool of processes.
+
+  Returns the paths of the images.
+  """
+  os.makedirs(directory, exist_ok=True)
+  jobs = [(N, os.path.join(directory, "N_%06d.%s" % (N, fmt)), variation, scan, 100, lod) for N in N_L]
+  with Pool(workers) as pool:
+    return pool.starmap(render, jobs)
+
+
+if __name__ == "__main__":
+  render(500, "500_v1.png", variation=1)
@@ -0,0 +1,139 @@
+import csv
+import glob
+import os
+from itertools import count, islice
+import numpy as np
+
+from util import IncrementalSolver
+import variation_1
+import variation_2
+
+RECORD = np.dtype([('N', 'i8'), ('D_calc', 'f8'), ('D_theorem', 'f8'), ('source', 'i8'), ('tangent', 'f8', (2,))])
+
+
+def stream_darkness(variation, start=1, stop=None, mode='float64'):
+  """
+  Generate the records (N, D_calc, D_theorem, source index, tangent) of a variation for N = start, start + 1, ...
+  up to stop (exclusive), or forever if stop is None.
+
+  Nothing is kept besides the state of an IncrementalSolver, so memory stays constant however long the sweep runs.
+  D_theorem is nan for variation 2, which has no formula.
+  """
+  solve = IncrementalSolver((variation_1 if variation == 1 else variation_2).solve_darkness)
+  for N in (count(start) if stop is None else range(start, stop)):
+    DA, source, tangent, _ = solve(N, mode=mode)
+    DA_theorem = variation_1.theorem_4_3_formula(N, mode) if variation == 1 else np.nan
+    yield N, float(DA), float(DA_theorem), source, (float(tangent[0]), float(tangent[1]))
+
+
+def drain(records, sink, chunk_size=1024):
+  """
+  Write records to a sink in chunks of chunk_size, flushing after each so the output can be followed live.
+
+  Returns the number of records written.
+  """
+  written = 0
+  records = iter(records)
+  with sink:
+    while True:
+      chunk = list(islice(records, chunk_size))
+      if not chunk:
+        return written
+      sink.write(np.array(chunk, dtype=RECORD))
+      written += len(chunk)
+
+
+class CsvSink:
+  """
+  Appends records to a CSV file, with a header if the file is new.
+  """
+
+  def __init__(self, path):
+    self.path = path
+
+  def __enter__(self):
+    self.file = open(self.path, 'a', newline='')
+    self.writer = csv.writer(self.file, lineterminator='\n')
+    if self.file.tell() == 0:
+      self.writer.writerow(['N', 'D_calc', 'D_theorem', 'source', 'tangent_x', 'tangent_y'])
+    return self
+
+  def write(self, chunk):
+    for r in chunk:
+      self.writer.writerow([r['N'], r['D_calc'], r['D_theorem'], r['source'], r['tangent'][0], r['tangent'][1]])
+    self.file.flush()
+
+  def __exit__(self, *exc):
+    self.file.close()
+
+
+class NpySink:
+  """
+  Saves each chunk of records as its own .npy file in a directory (chunk_000000.npy, ...), as a .npy file cannot be
+  appended to. Use load_npy to read them back as one array.
+  """
+
+  def __init__(self, directory):
+    self.directory = directory
+
+  def __enter__(self):
+    os.makedirs(self.directory, exist_ok=True)
+    self.index = len(glob.glob(os.path.join(self.directory, "chunk_*.npy")))
+    return self
+
+  def write(self, chunk):
+    np.save(os.path.join(self.directory, "chunk_%06d.npy" % self.index), chunk)
+    self.index += 1
+
+  def __exit__(self, *exc):
+    pass
+
+
+def load_npy(directory):
+  """
+  Load the chunks written by an NpySink as one record array.
+  """
+  paths = sorted(glob.glob(os.path.join(directory, "chunk_*.npy")))
+  return np.concatenate([np.load(path) for path in paths]) if paths else np.empty(0, dtype=RECORD)
+
+
+class ParquetSink:
+  """
+  Writes records to a new Parquet file (Parquet files cannot be appended to), one row group per chunk. This needs
+  the pyarrow package.
+  """
+
+  def __init__(self, path):
+    self.path = path
+
+  def __enter__(self):
+    try:
+      import pyarrow
+      import pyarrow.parquet
+    except ImportError:
+      raise ImportError("The Parquet sink needs the pyarrow package (pip install pyarrow)")
+    self.pa = pyarrow
+    self.writer = None
+    return self
+
+  def write(self, chunk):
+    table = self.pa.table({
+        'N': chunk['N'],
+        'D_calc': chunk['D_calc'],
+        'D_theorem': chunk['D_theorem'],
+        'source': chunk['source'],
+        'tangent_x': chunk['tangent'][:, 0],
+        'tangent_y': chunk['tangent'][:, 1],
+    })
+    if self.writer is None:
+      self.writer = self.pa.parquet.ParquetWriter(self.path, table.schema)
+    self.writer.write_table(table)
+
+  def __exit__(self, *exc):
+    if self.writer is not None:
+      self.writer.close()
+
+
+if __name__ == "__main__":
+  # runs until interrupted, follow it with `tail -f darkness_2.csv`
+  drain(stream_darkness(2), CsvSink("darkness_2.csv"), chunk_size=100)
@@ -0,0 +1,78 @@
+import csv
+import os
+from multiprocessing import Pool
+import numpy as np
+
+from util import IncrementalSolver
+import variation_1
+import variation_2
+
+COLUMNS = ['N', 'variation_1', 'theorem_4_3', 'variation_2']
+
+
+def compute_chunk(N_L):
+  """
+  Compute the table rows (N, variation 1, Theorem 4.3, variation 2) for a chunk of lighthouse counts. Variation 2 is
+  solved incrementally through the chunk.
+  """
+  DA_1, _, _ = variation_1.compute_darkness_batch(N_L)
+  DA_theorem = variation_1.theorem_4_3_formula_batch(N_L)
+  solve = IncrementalSolver(variation_2.solve_darkness)
+  DA_2 = [solve(N)[0] for N in N_L]
+  return [(N, float(d1), float(dt), float(d2)) for N, d1, dt, d2 in zip(N_L, DA_1, DA_theorem, DA_2)]
+
+
+def read_completed(path):
+  """
+  Read the lighthouse counts already in a sweep table. A partially written last row (e.g. from an interrupted sweep) is
+  cut off the file.
+  """
+  if not os.path.exists(path):
+    return set()
+  with open(path, 'r+', newline='') as f:
+    text = f.read()
+    if not text.endswith('\n'):
+      f.truncate(text.rfind('\n') + 1)
+      text = text[:text.rfind('\n') + 1]
+  rows = list(csv.reader(text.splitlines()))
+  return set(int(row[0]) for row in rows[1:])
+
+
+def sweep(N_L, path, workers=None, chunk_size=256):
+  """
+  Compute the dark areas for every N in N_L over a pool of worker processes, and append them to the table at path.
+
+  The range is split into chunks of chunk_size, and the results are written back in order as they come in, so an
+  interrupted sweep can be resumed by calling this again: the counts already in the table are skipped.
+
+  Returns the number of rows written.
+  """
+  done = read_completed(path)
+  todo = [N for N in N_L if N not in done]
+  chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+  written = 0
+  with open(path, 'a', newline='') as f, Pool(workers) as pool:
+    writer = csv.writer(f, lineterminator='\n')
+    if f.tell() == 0:
+      writer.writerow(COLUMNS)
+    for rows in pool.imap(compute_chunk, chunks):
+      writer.writerows(rows)
+      f.flush()
+      written += len(rows)
+  return written
+
+
+def load_table(path):
+  """
+  Load a sweep table as a dictionary of arrays, one per column, sorted by N.
+  """
+  with open(path) as f:
+    rows = list(csv.reader(f))[1:]
+  table = np.array(rows, dtype=float)
+  table = table[np.argsort(table[:, 0])]
+  return {name: table[:, i] for i, name in enumerate(COLUMNS)}
+
+
+if __name__ == "__main__":
+  max_lighthouses = 10000
+  print(sweep(range(1, max_lighthouses + 1), "darkness.csv"), "rows written")
@@ -0,0 +1,194 @@
+import os
+from multiprocessing import Pool
+import numpy as np
+
+from util import find_lighthouse_illum_points, find_crossing
+from cache import GEOMETRY_VERSION, DEFAULT_DIRECTORY
+from precision import get_backend, ring_point, solve_crossing
+import variation_1
+import variation_2
+
+DEFAULT_PATH = os.path.join(DEFAULT_DIRECTORY, "table_v" + str(GEOMETRY_VERSION) + ".npy")
+
+# Row N holds the record of N lighthouses. Row 0 is unused, with N = 0, as there is always at least one lighthouse.
+RECORD = np.dtype([('N', 'i8'), ('variation_1', 'f8'), ('theorem_4_3', 'f8'), ('variation_2', 'f8'), ('source_1', 'i8'),
+                   ('source_2', 'i8'), ('cross_x_1', 'f8'), ('cross_x_2', 'f8')])
+
+# Expansions of variation 1 in 1 / N for odd N (see expansion_coefficients), in which the source is the farthest
+# lighthouse, (N - 1) / 2:
+#   calculated dark area   N^2 (V1[0] + V1[1] / N^2 + V1[2] / N^4 + ...) - pi N / 2
+#   Theorem 4.3            N^2 (THEOREM[0] + THEOREM[1] / N^2 + ...) - pi N / 2
+#   crossing x             N (CROSS[0] + CROSS[1] / N^2 + ...)
+# The leading coefficient of both dark areas is 2 (1 + pi) / (pi^2 - 1). With these terms, the expansions agree with
+# mpmath to float64 precision from N = 51 on.
+V1 = (0.9338844138485197, 1.0200136628611605, 0.4637742461883503, 0.8489733831843711, 1.789622505759197,
+      3.5846995912275044)
+THEOREM = (0.9338844138485197, 1.5481998128510399, 1.1433830172945233, 2.9444261721104313, 6.4469387797948995,
+           13.193762085648813)
+CROSS = (1.9338844138485196, 0.7346154994637122, 0.8711725020422886, 1.4998038481796026, 2.7597981255260993,
+         5.051330134461706)
+
+# Beyond the table, variation 1 is answered by the expansions from this many lighthouses on.
+ASYMPTOTIC_N = 1000
+
+
+def expansion_coefficients(terms=len(V1), dps=100, samples=24):
+  """
+  Derive the coefficients V1, THEOREM and CROSS with mpmath, from the same geometry as precision.refine and from
+  theorem_4_3_formula, by fitting polynomials in 1 / N^2 to them at N = 1000.5 / j for j = 1 to samples. These N are
+  not integers, but the formulas hold for any real N, and avoid even N, where the dark area is infinite.
+  """
+  be = get_backend('mpmath', dps)  # raises if mpmath is missing
+  import mpmath
+  ctx = mpmath.MPContext()
+  ctx.dps = dps
+  eps = [j / be.num(1000.5) for j in range(1, samples + 1)]
+  powers = ctx.matrix([[ctx.mpf(e)**(2 * k) for k in range(samples)] for e in eps])
+
+  def fit(values):
+    c = ctx.lu_solve(powers, ctx.matrix([ctx.mpf(v) for v in values]))
+    return tuple(float(c[k]) for k in range(terms))
+
+  geometry = []
+  for e in eps:
+    N = 1 / e
+    _, cross_x, _, DA = solve_crossing(N, ring_point(N, (N - 1) / 2, 'center', be), be)
+    geometry.append((DA, cross_x))
+  theorem = [variation_1.theorem_4_3_formula(1 / e, 'mpmath', dps) for e in eps]
+  return (fit([(DA * e + be.pi / 2) * e for (DA, _), e in zip(geometry, eps)]),
+          fit([(DA * e + be.pi / 2) * e for DA, e in zip(theorem, eps)]),
+          fit([cross_x * e for (_, cross_x), e in zip(geometry, eps)]))
+
+
+def expansion(coefficients, N):
+  """
+  sum_k coefficients[k] / N^(2 k), by Horner's rule.
+  """
+  u = 1 / (N * N)
+  total = np.zeros_like(u)
+  for c in reversed(coefficients):
+    total = total * u + c
+  return total
+
+
+def asymptotic_records(Ns):
+  """
+  The variation 1 fields (variation_1, theorem_4_3, source_1 and cross_x_1) of the records of large N, by the
+  expansions. The other fields are left at zero.
+  """
+  N = np.asarray(Ns, dtype=np.int64)
+  Nf = N.astype(float)
+  records = np.zeros(len(N), dtype=RECORD)
+  records['N'] = N
+  odd = N % 2 == 1
+  records['variation_1'] = np.where(odd, Nf * Nf * expansion(V1, Nf) - np.pi * Nf / 2, np.inf)
+  records['theorem_4_3'] = np.where(odd, Nf * Nf * expansion(THEOREM, Nf) - np.pi * Nf / 2, np.inf)
+  records['source_1'] = N // 2  # (N - 1) / 2 for odd N, and N / 2 for even N, where the dark area is infinite
+  records['cross_x_1'] = np.where(odd, Nf * expansion(CROSS, Nf), np.nan)
+  return records
+
+
+def solve_records(Ns, asymptotic=False):
+  """
+  The records of an array of lighthouse counts, by the batch solvers of both variations. If asymptotic is set,
+  variation 1 of the counts from ASYMPTOTIC_N on is taken from the expansions instead (see asymptotic_records).
+  """
+  N = np.asarray(Ns, dtype=np.int64)
+  Nf = N.astype(float)
+  records = np.zeros(len(N), dtype=RECORD)
+  records['N'] = N
+  if len(N) == 0:
+    return records
+
+  large = N >= ASYMPTOTIC_N if asymptotic else np.zeros(len(N), dtype=bool)
+  fields = ['variation_1', 'theorem_4_3', 'source_1', 'cross_x_1']
+  records[fields][large] = asymptotic_records(N[large])[fields]
+  solved, n = ~large, N[~large]
+  DA, sources, tangents = variation_1.compute_darkness_batch(n)
+  theta = 2 * np.pi * sources / n
+  centers = np.stack([n * np.cos(theta), n * np.sin(theta)], axis=-1)
+  records['variation_1'][solved], records['theorem_4_3'][solved] = DA, variation_1.theorem_4_3_formula_batch(n)
+  records['source_1'][solved], records['cross_x_1'][solved] = sources, find_crossing(n, centers, tangents)[0]
+
+  DA, sources, tangents = variation_2.compute_darkness_batch(N)
+  theta = 2 * np.pi * sources / Nf
+  centers = np.stack([Nf * np.cos(theta), Nf * np.sin(theta)], axis=-1)
+  left = find_lighthouse_illum_points(Nf, centers, (0.0, 0.0), R=Nf[:, None])[:, 0]
+  records['variation_2'], records['source_2'] = DA, sources
+  records['cross_x_2'] = np.where(sources > 0, find_crossing(N, left, tangents)[0], np.nan)
+  return records
+
+
+def build_table(bound, path=DEFAULT_PATH, workers=None, chunk_size=1 << 14):
+  """
+  Precompute the records of N = 1 to bound into a memory-mapped .npy file at path, in chunks over a pool of processes.
+  The records come from the float64 batch solvers, like those of sweep.
+
+  Returns the path.
+  """
+  directory = os.path.dirname(path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+  table = np.lib.format.open_memmap(path, mode='w+', dtype=RECORD, shape=(bound + 1,))
+  table[0] = np.zeros(1, dtype=RECORD)
+  chunks = [np.arange(start, min(start + chunk_size, bound + 1)) for start in range(1, bound + 1, chunk_size)]
+  with Pool(workers) as pool:
+    for chunk, records in zip(chunks, pool.imap(solve_records, chunks)):
+      table[chunk] = records
+  table.flush()
+  del table
+  return path
+
+
+class DarknessTable:
+  """
+  Dark areas of N lighthouses, answered from a table written by build_table, which is memory-mapped read-only so
+  that queries are O(1) and do not load the file.
+
+  Beyond the bound of the table, records are solved by the batch solvers, which build no lighthouses and take O(log N)
+  steps, and variation 1 is taken from its expansions from ASYMPTOTIC_N on.
+  """
+
+  def __init__(self, path=DEFAULT_PATH):
+    self.path = path
+    self.table = np.load(path, mmap_mode='r')
+    if self.table.dtype != RECORD:
+      raise Exception("Not a dark area table: " + path)
+
+  @property
+  def bound(self):
+    return len(self.table) - 1
+
+  def get(self, N):
+    """
+    The record of N lighthouses, with the fields of RECORD.
+    """
+    return self.lookup([N])[0]
+
+  def lookup(self, Ns):
+    """
+    The records of an array of lighthouse counts, as an array of RECORD.
+    """
+    N = np.asarray(Ns, dtype=np.int64)
+    if (N < 1).any():
+      raise Exception("There has to be at least one lighthouse")
+    inside = N <= self.bound
+    if inside.all():
+      return np.array(self.table[N])
+    records = np.empty(N.shape, dtype=RECORD)
+    records[inside] = self.table[N[inside]]
+    records[~inside] = solve_records(N[~inside], asymptotic=True)
+    return records
+
+  def darkness(self, N, variation=1):
+    """
+    The dark area of N lighthouses in a variation (1 or 2), or by Theorem 4.3 if variation is 'theorem'.
+    """
+    field = 'theorem_4_3' if variation == 'theorem' else 'variation_' + str(variation)
+    return float(self.get(N)[field])
+
+
+if __name__ == "__main__":
+  build_table(100000)
+  table = DarknessTable()
+  print(table.get(9), table.get(10**9 + 1))
@@ -1,11 +1,58 @@
+from math import inf, sqrt, atan2, cos, sin, degrees, pi
 import numpy as np
 
 
+def dist_2d_batch(p1, p2, out=None):
+  """
+  Distances between points p1 and p2, given as (..., 2) arrays that are broadcast against each other. If out is given,
+  the distances are written there.
+  """
+  d = np.subtract(p1, p2, dtype=float)
+  return np.sqrt(d[..., 0]**2 + d[..., 1]**2, out=out)
+
+
+def angle_2d_batch(p1, p2, p3, out=None):
+  """
+  Angles at p2 from p1 counterclockwise to p3, in radians in [0, 2 pi). The points are (..., 2) arrays that are
+  broadcast against each other. If out is given, the angles are written there.
+  """
+  d1, d3 = np.subtract(p1, p2, dtype=float), np.subtract(p3, p2, dtype=float)
+  ang = np.subtract(np.arctan2(d3[..., 1], d3[..., 0]), np.arctan2(d1[..., 1], d1[..., 0]), out=out)
+  ang += (ang < 0) * (2 * np.pi)
+  return ang
+
+
+def rotation_matrix(angle_rad):
+  """
+  Counterclockwise rotation matrices for angles in radians, as a (..., 2, 2) array. Computing these once saves the cos
+  and sin of rotating many points by the same angle.
+  """
+  c, s = np.cos(angle_rad), np.sin(angle_rad)
+  matrix = np.empty(np.shape(c) + (2, 2))
+  matrix[..., 0, 0], matrix[..., 0, 1] = c, -s
+  matrix[..., 1, 0], matrix[..., 1, 1] = s, c
+  return matrix
+
+
+def rotate_batch(origin, points, matrix, out=None):
+  """
+  Rotate points around origin by rotation matrices (see rotation_matrix). The origins and points are (..., 2) arrays
+  and the matrices a (..., 2, 2) array, which are broadcast against each other, e.g. (M, 2) points by a single matrix,
+  or a single point by (M, 2, 2) matrices. If out is given, the rotated points are written there.
+  """
+  origin, matrix = np.asarray(origin, dtype=float), np.asarray(matrix)
+  d = np.subtract(points, origin)
+  # origin + m00 dx + m01 dy, summed in the same order as rotate always did
+  return np.add(origin + d[..., 0, None] * matrix[..., 0], d[..., 1, None] * matrix[..., 1], out=out)
+
+
 def dist_2d(p1, p2):
   """
-  Distance between two points in 2D.
+  Distance between two points in 2D. This is dist_2d_batch for a single pair of points, in the same order of operations
+  so that both give the same result, without building arrays.
   """
-  return np.sqrt(((p1[0] - p2[0])**2) + ((p1[1] - p2[1])**2))
+  dx, dy = p1[0] - p2[0], p1[1] - p2[1]
+  return sqrt(dx * dx + dy * dy)
 
 
 def angle_2d(p1, p2, p3):
@@ -17,45 +64,352 @@ def angle_2d(p1, p2, p3):
    / 
   p2 _ _ _ p3
 
+  This is angle_2d_batch for a single triple of points, in degrees, in the same order of operations. The two can still
+  differ in the last ulp, as math.atan2 and np.arctan2 need not round alike. The solvers compare the radians of
+  angle_2d_batch directly.
+
   Source: https://python-forum.io/Thread-finding-angle-between-three-points-on-a-2d-graph 
   """
-  ang = np.degrees(np.arctan2(p3[1] - p2[1], p3[0] - p2[0]) - np.arctan2(p1[1] - p2[1], p1[0] - p2[0]))
-  return ang + 360 if ang < 0 else ang
+  ang = atan2(p3[1] - p2[1], p3[0] - p2[0]) - atan2(p1[1] - p2[1], p1[0] - p2[0])
+  return degrees(ang + 2 * pi if ang < 0 else ang)
 
 
 def rotate(origin, point, angle_rad):
   """
   Rotate a point counterclockwise by a given angle around a given origin.
 
-  The angle should be given in radians.
+  The angle should be given in radians. This is rotate_batch for a single point, summed in the same order so that both
+  give the same result, without building arrays. Rotating many points by the same angle is better done with
+  rotate_batch directly.
 
   Source: https://stackoverflow.com/questions/34372480/rotate-point-about-another-point-in-degrees-python
   """
   ox, oy = origin
-  px, py = point
+  dx, dy = point[0] - ox, point[1] - oy
+  c, s = cos(angle_rad), sin(angle_rad)
+  return (ox + dx * c - dy * s, oy + dx * s + dy * c)
+
+
+def pyplot():
+  """
+  matplotlib.pyplot, imported on first use so that runs which only compute never load matplotlib.
+  """
+  import matplotlib.pyplot as plt
+  plt.rcParams.update({'figure.autolayout': True})
+  return plt
+
 
-  qx = ox + np.cos(angle_rad) * (px - ox) - np.sin(angle_rad) * (py - oy)
-  qy = oy + np.sin(angle_rad) * (px - ox) + np.cos(angle_rad) * (py - oy)
-  return (qx, qy)
+def illumination_line(start, tang, isValid):
+  """
+  The Line2D object to draw an illumination line from start to the tangent point with: green if it is valid, dashed
+  red otherwise.
+  """
+  from matplotlib.lines import Line2D
+  if isValid:
+    return Line2D([start[0], tang[0]], [start[1], tang[1]], color='green', linewidth=0.5)
+  return Line2D([start[0], tang[0]], [start[1], tang[1]], color='red', linestyle="--", linewidth=0.5)
 
 
-def find_lighthouse_centers(N, PC):
+def find_lighthouse_centers(N, PC, half=False, out=None, R=None):
   """
-  Calculate the center coordinates of lighthouses.
+  Calculate the center coordinates of lighthouses, as an (N, 2) array. If out is given, the centers are written there.
+
+  Lighthouse i is at angle i * 360 / N on the circle of radius R (N by default), and all angles are evaluated at once.
+  Only the upper half of the ring (up to lighthouse N // 2) is calculated, and the lower half is its reflection. With
+  half set, only the upper half is returned, as an (N // 2 + 1, 2) array.
   """
-  alpha_rad = np.radians(360.0 / N)
-  centers = []
-  centers.append((PC[0] + N, PC[1]))
-  for i in range(1, N):
-    centers.append(rotate(PC, centers[i - 1],
-                          alpha_rad))  # TODO: can refactor this, calculates the sin cos everytime...
+  M = N // 2 + 1
+  R = N if R is None else R
+  centers = np.empty((M if half else N, 2)) if out is None else out
+  angles = np.arange(M) * (2 * np.pi / N)
+  centers[:M, 0] = PC[0] + R * np.cos(angles)
+  centers[:M, 1] = PC[1] + R * np.sin(angles)
+  if not half and N > 1:
+    centers[M:] = centers[N - M:0:-1]  # i and N - i mirror each other along the x axis through PC
+    centers[M:, 1] = 2 * PC[1] - centers[M:, 1]
   return centers
 
 
-def find_lighthouse_illum_points(N, LC, PC):
+def find_lighthouse_centers_at(N, PC, indices, R=None):
+  """
+  Calculate the centers of just the lighthouses at the given indices (an int or an array of them), as a (2,) or
+  (..., 2) array. These are the same values as find_lighthouse_centers gives, including the reflection of the lower
+  half, without calculating the rest of the ring.
+  """
+  indices = np.asarray(indices)
+  mirrored = indices > N // 2
+  angles = np.where(mirrored, N - indices, indices) * (2 * np.pi / N)
+  R = N if R is None else R
+  centers = np.empty(indices.shape + (2,))
+  centers[..., 0] = PC[0] + R * np.cos(angles)
+  centers[..., 1] = PC[1] + R * np.sin(angles)
+  centers[..., 1] = np.where(mirrored, 2 * PC[1] - centers[..., 1], centers[..., 1])
+  return centers
+
+
+def find_lighthouse_illum_points(N, LC, PC, out=None, R=None, r=1.0, alpha=None):
   """
   Calculate the edges of the illumination angle.
+
+  LC is either a single center or an (M, 2) array of centers on the ring of radius R (N by default), and the result is
+  a (3, 2) or (M, 3, 2) array of left, middle and right points. The middle point is on the lighthouse of radius r,
+  facing PC, and the left and right points are alpha / 2 degrees (360 / N by default) away from it. If out is given,
+  the points are written there.
+  """
+  LC = np.asarray(LC, dtype=float)
+  R = N if R is None else R
+  mid = ((R - r) * LC + r * np.asarray(PC, dtype=float)) / R
+  half = np.radians(360.0 / N if alpha is None else alpha) / 2
+  points = np.empty(LC.shape[:-1] + (3, 2)) if out is None else out
+  rotate_batch(LC, mid, rotation_matrix(half), out=points[..., 0, :])  # left
+  points[..., 1, :] = mid  # middle
+  rotate_batch(LC, mid, rotation_matrix(-half), out=points[..., 2, :])  # right
+  return points
+
+
+def find_crossing(N, source, tangent, r=1.0):
+  """
+  Intersect the illumination line from source through tangent with the x axis, the ray from the placement center
+  through the target lighthouse, and find the dark area this defines.
+
+  source and tangent are single points or (M, 2) arrays of points. Returns the x of the crossing, the nugget x (the
+  distance from the crossing to the tangent point) and the dark area N * (x - arctan x) by Theorem 4.3, or
+  N * (r x - r^2 arctan(x / r)) for lighthouses of radius r. If the line does not go down from the source to the
+  tangent, it never crosses behind the target: the dark area is infinite and the crossing is nan. Vertical lines need
+  no special care, unlike fitting y = ax + b.
+  """
+  source, tangent = np.asarray(source, dtype=float), np.asarray(tangent, dtype=float)
+  drop = source[..., 1] - tangent[..., 1]
+  finite = drop > 0
+  with np.errstate(divide='ignore', invalid='ignore'):
+    cross_x = np.where(finite, source[..., 0] + source[..., 1] * (tangent[..., 0] - source[..., 0]) / drop, np.nan)
+  x = np.hypot(cross_x - tangent[..., 0], tangent[..., 1])
+  DA = np.where(finite, N * (r * x - r * r * np.arctan(x / r)), inf)
+  return cross_x[()], x[()], DA[()]
+
+
+def find_true_nugget(N, cross_x, R=None, r=1.0):
+  """
+  The nugget x and the dark area of an illumination line that crosses the x axis at cross_x, measured up to where the
+  line touches the target lighthouse of radius r at (R, 0) (R = N by default), as in Theorem 4.3.
+
+  find_crossing measures the nugget up to the tangent point that the solvers construct, which is as far from the
+  source as the center of the target and so lies past the true tangent point, towards the crossing. Its dark areas are
+  lower by that much. The true nugget is the length of the tangent from the crossing, sqrt((cross_x - R)^2 - r^2).
+  cross_x can be an array, and nan gives nan.
+  """
+  R = N if R is None else R
+  x = np.sqrt((np.asarray(cross_x, dtype=float) - R)**2 - r * r)
+  return x[()], (N * (r * x - r * r * np.arctan(x / r)))[()]
+
+
+class RingConfig:
   """
-  mid = (((N - 1) * LC[0] + PC[0]) / N, ((N - 1) * LC[1] + PC[1]) / N)
-  alpha_rad = np.radians(360.0 / N)
-  return [rotate(LC, mid, alpha_rad / 2), mid, rotate(LC, mid, -alpha_rad / 2)]  # left middle right
+  The shape of a ring of N lighthouses: the ring radius R (from the placement center to the lighthouse centers), the
+  lighthouse radius r and the light angle alpha in degrees. The defaults are those of the paper, R = N, r = 1 and
+  alpha = 360 / N, for which the solvers give the same results as without a configuration.
+  """
+  __slots__ = ('N', 'R', 'r', 'alpha')
+
+  def __init__(self, N, R=None, r=1.0, alpha=None):
+    self.N = N
+    self.R = float(N) if R is None else float(R)
+    self.r = float(r)
+    self.alpha = 360.0 / N if alpha is None else float(alpha)
+    if self.r <= 0 or not 0 < self.alpha <= 360:
+      raise Exception("Invalid ring configuration: " + repr(self))
+    if N > 1 and self.R * np.sin(np.pi / N) < self.r:
+      raise Exception("The lighthouses overlap: " + repr(self))
+
+  def __repr__(self):
+    return "RingConfig(N=%d, R=%r, r=%r, alpha=%r)" % (self.N, self.R, self.r, self.alpha)
+
+
+def broadcast_configs(Ns, R=None, r=1.0, alpha=None):
+  """
+  Broadcast arrays of ring configurations (see RingConfig) against each other, e.g. Ns[:, None] and r[None, :] give a
+  2D grid of lighthouse counts and radii. R and alpha default to N and 360 / N at each point.
+
+  Returns N (as integers), R, r and alpha as arrays of the same shape.
+  """
+  N = np.asarray(Ns, dtype=np.int64)
+  with np.errstate(divide='ignore'):
+    R = N if R is None else R
+    alpha = 360.0 / N if alpha is None else alpha
+  N, R, r, alpha = np.broadcast_arrays(N, R, r, alpha)
+  return N, R.astype(float), r.astype(float), alpha.astype(float)
+
+
+class RingPoints:
+  """
+  The points of a lazy LighthouseRing at the indices they are read at: an int, a slice or an array of indices, like
+  the views of a stored ring. role is the position on the second axis of LighthouseRing.points, or None for all four.
+  """
+  __slots__ = ('ring', 'role')
+
+  def __init__(self, ring, role):
+    self.ring = ring
+    self.role = role
+
+  def __len__(self):
+    return len(self.ring)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      index = np.arange(*index.indices(len(self.ring)))
+    points = self.ring.evaluate(index)
+    return points if self.role is None else points[..., self.role, :]
+
+
+class LighthouseRing:
+  """
+  N lighthouses placed around PC, stored in one contiguous (N, 4, 2) array.
+
+  The second axis holds the center, left, middle and right points of each lighthouse, which are also exposed as the
+  center, left, middle and right views. The illumination points are only calculated the first time they are read.
+  The shape of the ring is given by a RingConfig, which defaults to the one of the paper.
+
+  With half set, only lighthouses 0 to N // 2 are stored, which is all the solvers read for target lighthouse 0. The
+  length of the ring is still N.
+
+  With lazy set, nothing is stored, and the views are RingPoints that calculate the points of just the indices read
+  (see evaluate). This is what the solvers use, as a search reads O(log N) lighthouses, and their collision candidates,
+  out of N.
+  """
+  __slots__ = ('N', 'PC', 'config', '_points', '_has_illum_points')
+
+  def __init__(self, N, PC=(0.0, 0.0), half=False, config=None, lazy=False):
+    if config is not None and config.N != N:
+      raise Exception("The configuration is for %d lighthouses, not %d" % (config.N, N))
+    self.N = N
+    self.PC = PC
+    self.config = RingConfig(N) if config is None else config
+    self._points = None
+    self._has_illum_points = False
+    if not lazy:
+      self._points = np.empty((N // 2 + 1 if half else N, 4, 2))
+      find_lighthouse_centers(N, PC, half, out=self._points[:, 0], R=self.config.R)
+
+  def __len__(self):
+    return self.N
+
+  def evaluate(self, indices):
+    """
+    Calculate the center, left, middle and right points of the lighthouses at the given indices (an int or an array of
+    them), as a (4, 2) or (..., 4, 2) array, the same values as the stored ring has.
+    """
+    config = self.config
+    points = np.empty(np.shape(indices) + (4, 2))
+    points[..., 0, :] = find_lighthouse_centers_at(self.N, self.PC, indices, R=config.R)
+    find_lighthouse_illum_points(self.N,
+                                 points[..., 0, :],
+                                 self.PC,
+                                 out=points[..., 1:, :],
+                                 R=config.R,
+                                 r=config.r,
+                                 alpha=config.alpha)
+    return points
+
+  @property
+  def points(self):
+    if self._points is None:
+      return RingPoints(self, None)
+    if not self._has_illum_points:
+      config = self.config
+      find_lighthouse_illum_points(self.N,
+                                   self._points[:, 0],
+                                   self.PC,
+                                   out=self._points[:, 1:],
+                                   R=config.R,
+                                   r=config.r,
+                                   alpha=config.alpha)
+      self._has_illum_points = True
+    return self._points
+
+  @property
+  def center(self):
+    return RingPoints(self, 0) if self._points is None else self._points[:, 0]
+
+  @property
+  def left(self):
+    return RingPoints(self, 1) if self._points is None else self.points[:, 1]
+
+  @property
+  def middle(self):
+    return RingPoints(self, 2) if self._points is None else self.points[:, 2]
+
+  @property
+  def right(self):
+    return RingPoints(self, 3) if self._points is None else self.points[:, 3]
+
+
+def bisect_first_valid(is_valid, lo, hi, guess=None):
+  """
+  Find the smallest index i in [lo, hi] such that is_valid(i), assuming validity is monotone: once an index is valid,
+  all the following ones are too. This takes O(log (hi - lo)) evaluations of is_valid.
+
+  If a guess is given, the search starts there and steps away from it in doubling steps until the answer is
+  bracketed, and then bisects the bracket. This takes O(log d) evaluations, where d is how far off the guess was.
+
+  Returns None if there is no valid index.
+  """
+  if hi < lo:
+    return None
+  if guess is None:
+    if not is_valid(hi):
+      return None
+  else:
+    guess, step = min(max(guess, lo), hi), 1
+    if is_valid(guess):
+      hi = guess
+      while hi > lo:
+        probe = max(hi - step, lo)
+        if not is_valid(probe):
+          lo = probe + 1
+          break
+        hi, step = probe, step * 2
+    else:
+      lo = guess + 1
+      while True:
+        if lo > hi:
+          return None
+        probe = min(lo + step - 1, hi)
+        if is_valid(probe):
+          hi = probe
+          break
+        lo, step = probe + 1, step * 2
+  while lo < hi:
+    mid = (lo + hi) // 2
+    if is_valid(mid):
+      hi = mid
+    else:
+      lo = mid + 1
+  return lo
+
+
+class IncrementalSolver:
+  """
+  Solves a variation for a sequence of N (usually increasing one by one), warm-starting each source search from the
+  previous answer.
+
+  The source index grows in proportion to N (it is N // 2 in variation 1, and about N / 10 in variation 2), so the
+  guess for N is the last source index scaled by N over the last N. The state is this last (N, source index) pair.
+
+  Nothing else is carried over: all the lighthouses move when N changes, so neither their points nor the set of
+  lighthouses that may collide with a line carry over. solve_darkness only calculates the points of the lighthouses
+  it probes and of their collision candidates (see LighthouseRing with lazy set), so a warm solve does not touch the
+  rest of the ring.
+  """
+  __slots__ = ('solve_darkness', 'last')
+
+  def __init__(self, solve_darkness):
+    self.solve_darkness = solve_darkness
+    self.last = None
+
+  def __call__(self, N, **kwargs):
+    guess = None
+    if self.last is not None and self.last[1] > 0:
+      guess = int(round(self.last[1] * N / self.last[0]))
+    record = self.solve_darkness(N, guess=guess, **kwargs)
+    self.last = (N, record[1])
+    return record
@@ -1,38 +1,80 @@
 from math import inf
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import rcParams
-from matplotlib.lines import Line2D
 
-rcParams.update({'figure.autolayout': True})
-from util import rotate, dist_2d, angle_2d, find_lighthouse_centers, find_lighthouse_illum_points
+from util import pyplot, illumination_line, rotate, dist_2d, angle_2d_batch, rotate_batch, rotation_matrix, \
+    dist_2d_batch, LighthouseRing, bisect_first_valid, find_crossing, broadcast_configs
+from precision import get_backend, cancellation, refine, to_float64
 
 
-def find_tangent(LC_s, LC_t):
+def find_tangent(LC_s, LC_t, r=1.0):
   """
-  Given a source and target lighthouse center with radius 1, find the tangent. 
+  Given a source and target lighthouse center with radius r, find the tangent. 
   
   This is done by first finding the angle between LC_t, LC_s, tang and then calculating the tang itself via rotation.
   """
-  return rotate(LC_s, LC_t, np.arcsin(1 / dist_2d(LC_s, LC_t)))
+  return rotate(LC_s, LC_t, np.arcsin(r / dist_2d(LC_s, LC_t)))
 
 
-def get_illumination_line(LC_s, LC_t, PC, N):
+def check_illumination_line(LC_s, LC_t, PC, N, config=None):
   """
-  Draws the illumination line from a source lighthouse to target lighthouse (variation 1: source point of light)
+  Test the illumination line from a source lighthouse to target lighthouse (variation 1: source point of light), on a
+  ring of the shape of config (a RingConfig) if given.
 
-  Returns a boolean that shows whether it is a valid line, the tangent point, and a Line2D object to draw.
+  Returns a boolean that shows whether it is a valid line, and the tangent point.
   """
-  tang = find_tangent(LC_s, LC_t)
-  angle = angle_2d(PC, LC_s, tang)
-  alphaHalf = 180 / N
-  if angle > alphaHalf:
-    return False, tang, Line2D([LC_s[0], tang[0]], [LC_s[1], tang[1]], color='red', linestyle="--", linewidth=0.5)
+  if config is None:
+    tang = find_tangent(LC_s, LC_t)
+    alphaHalf = np.pi / N
   else:
-    return True, tang, Line2D([LC_s[0], tang[0]], [LC_s[1], tang[1]], color='green', linewidth=0.5)
+    tang = find_tangent(LC_s, LC_t, config.r)
+    alphaHalf = np.radians(config.alpha) / 2
+  return angle_2d_batch(PC, LC_s, tang) <= alphaHalf, tang
+
+
+def get_illumination_line(LC_s, LC_t, PC, N, config=None):
+  """
+  Draws the illumination line from a source lighthouse to target lighthouse (variation 1: source point of light), on
+  a ring of the shape of config (a RingConfig) if given.
+
+  Returns a boolean that shows whether it is a valid line, the tangent point, and a Line2D object to draw.
+  """
+  isValid, tang = check_illumination_line(LC_s, LC_t, PC, N, config)
+  return isValid, tang, illumination_line(LC_s, tang, isValid)
+
 
+def scan_first_illumination_line(ring, PC):
+  """
+  Linear search for the first valid source, starting from the immediate upper neighbor of the target lighthouse and
+  going counter-clockwise.
+
+  Returns the index of the source lighthouse, or None if there is no valid line.
+  """
+  for i in range(1, int(len(ring) / 2) + 1):
+    isValid, _ = check_illumination_line(ring.center[i], ring.center[0], PC, len(ring), ring.config)
+    if isValid:
+      return i
+  return None
+
+
+def find_source(ring, PC, cross_check=False, guess=None):
+  """
+  Find the index of the source lighthouse, the first one that can draw a valid line to the target lighthouse.
 
-def get_first_illumination_line(lighthouses, PC):
+  Once a source is valid, all sources further away are valid too, so the search is a bisection, which starts from the
+  guess if there is one (see bisect_first_valid). If cross_check is set, the answer is compared against the linear
+  scan.
+  """
+  N = len(ring)
+  i = bisect_first_valid(lambda i: check_illumination_line(ring.center[i], ring.center[0], PC, N, ring.config)[0], 1,
+                         int(N / 2), guess)
+  if cross_check and i != scan_first_illumination_line(ring, PC):
+    raise Exception("Bisection and linear scan disagree on the source lighthouse!")
+  if i is None:
+    raise Exception("No valid illuminations!")  # we dont expect this to happen
+  return i
+
+
+def get_first_illumination_line(ring, PC, cross_check=False):
   """
   Starting from the immediate upper neighbor of the target lighthouse (currently default to 0), and search counter-clockwise until you find a valid line. 
   
@@ -40,92 +82,86 @@ def get_first_illumination_line(lighthouses, PC):
   
   Returns the tangent, and the Line2D object.
   """
-  target = lighthouses[0]
-  for source in lighthouses[1:int(len(lighthouses) / 2) + 1]:
-    isValid, tang, line = get_illumination_line(source['center'], target['center'], PC, len(lighthouses))
-    if isValid:
-      return source['center'], tang, line
-  raise Exception("No valid illuminations!")  # we dont expect this to happen
+  i = find_source(ring, PC, cross_check)
+  _, tang, line = get_illumination_line(ring.center[i], ring.center[0], PC, len(ring), ring.config)
+  return ring.center[i], tang, line
 
 
-def theorem_4_3_formula(N):
+def theorem_4_3_formula(N, mode='float64', dps=30):
   """
   Dark area calculation from the paper. 
   
   Calculation is proven by Theorem 4.3, and the definition is given in Definition 6.1.
+
+  The numeric mode is one of precision.MODES. The formula itself is well conditioned, so 'auto' only switches to
+  mpmath if x - arctan(x) loses too much to cancellation, and rounds the result back to np.float64. dps is the number
+  of digits in mpmath.
   """
   if N == 1:
     return 0
   if N % 2 == 0:
     return inf
-  PI = np.pi
-  x = (np.sqrt(4 * N * N * (np.cos(PI / (2 * N)**2)) - 1) + 2 * N * N * np.sin(PI / N) *
-       (np.cos(PI / (2 * N))**2)) / (N * N * (np.sin(PI / N)**2) - 1)
-  return N * (x - np.arctan(x))
+  be = get_backend('float64' if mode == 'auto' else mode, dps)
+  PI = be.pi
+  N = be.num(N)
+  x = (be.sqrt(4 * N * N * (be.cos(PI / (2 * N)**2)) - 1) + 2 * N * N * be.sin(PI / N) *
+       (be.cos(PI / (2 * N))**2)) / (N * N * (be.sin(PI / N)**2) - 1)
+  if mode == 'auto' and be.eps * (1 + cancellation(x)) > 1e-12:
+    return to_float64(theorem_4_3_formula(int(N), 'mpmath'))
+  return N * (x - be.atan(x))
 
 
 def draw_all(N):
   '''
   Draw all lines until a match.
   '''
+  plt = pyplot()
+  from matplotlib.lines import Line2D
   placement_center = (0.0, 0.0)
-  centers = find_lighthouse_centers(N, placement_center)
-  lighthouses = []
-  for c in centers:
-    left, mid, right = find_lighthouse_illum_points(N, c, placement_center)
-    lighthouses.append({"center": c, "left": left, "middle": mid, "right": right})
+  ring = LighthouseRing(N, placement_center)
 
   # plots
   fig = plt.figure()
   ax = plt.axes()
   ax.scatter(placement_center[0], placement_center[1], color="red")
-  for l in lighthouses:
-    ax.add_patch(plt.Circle(l['center'], 1.0, color='black', fill=False))
-    ax.scatter(l['center'][0], l['center'][1], color="yellow")
-    ax.scatter(l['left'][0], l['left'][1], color="gray")
-    ax.scatter(l['right'][0], l['right'][1], color="gray")
-    ax.scatter(l['middle'][0], l['middle'][1], color="gray")
+  for center, left, mid, right in ring.points:
+    ax.add_patch(plt.Circle(center, 1.0, color='black', fill=False))
+    ax.scatter(center[0], center[1], color="yellow")
+    ax.scatter(left[0], left[1], color="gray")
+    ax.scatter(right[0], right[1], color="gray")
+    ax.scatter(mid[0], mid[1], color="gray")
     ax.add_line(
-        Line2D([l['center'][0], placement_center[0]], [l['center'][1], placement_center[1]],
+        Line2D([center[0], placement_center[0]], [center[1], placement_center[1]],
                linestyle='--',
                color='gray',
                linewidth=0.4))
-    ax.add_line(Line2D([l['center'][0], l['left'][0]], [l['center'][1], l['left'][1]], color='gray', linewidth=0.5))
-    ax.add_line(Line2D([l['center'][0], l['right'][0]], [l['center'][1], l['right'][1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], left[0]], [center[1], left[1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], right[0]], [center[1], right[1]], color='gray', linewidth=0.5))
 
   plt.xlim([-N - 1.5, N + 1.5])
   plt.ylim([-N - 1.5, N + 1.5])
   if N == 1:
     DA = 0
   else:
-    target = lighthouses[0]
-    for source in lighthouses[1:int(len(lighthouses) / 2) + 1]:
-      isValid, tang, line = get_illumination_line(source['center'], target['center'], placement_center,
-                                                  len(lighthouses))
+    for source in ring.center[1:int(N / 2) + 1]:
+      isValid, tang, line = get_illumination_line(source, ring.center[0], placement_center, N)
       ax.add_line(line)
       if isValid:
-        ax.scatter(source['center'][0], source['center'][1], color="green")
+        ax.scatter(source[0], source[1], color="green")
         ax.scatter(tang[0], tang[1], color="green")
         break
       else:
-        ax.scatter(source['center'][0], source['center'][1], color="red")
+        ax.scatter(source[0], source[1], color="red")
         ax.scatter(tang[0], tang[1], color="red")
-    if source['center'][1] <= tang[1]:
+    if source[1] <= tang[1]:
       # The dark area is infinite
       DA = inf
     else:
       # We can find the dark area
-      coeff = np.polyfit([tang[0], source['center'][0]], [tang[1], source['center'][1]],
-                         1)  # finds the coefficients of y = ax + b for points x, y.
-      target_cross_x = -coeff[1] / coeff[0]  # we look for 0 = ax' + b --> x = -b/a
+      target_cross_x, x, DA = find_crossing(N, source, tang)  # x is the nugget, and DA is by Theorem 4.3
       ax.scatter(target_cross_x, 0.0, color="orange")
       ax.add_line(Line2D([tang[0], target_cross_x], [tang[1], 0.0], color='gray', linewidth=0.5))
-      ax.add_line(
-          Line2D([lighthouses[0]['center'][0], target_cross_x], [lighthouses[0]['center'][1], 0.0],
-                 color='gray',
-                 linewidth=0.5))
-      x = dist_2d((target_cross_x, 0.0), tang)  # this is the nugget, we can find the dark area from this.
-      DA = N * (x - np.arctan(x))  # Theorem 4.3
+      ax.add_line(Line2D([ring.center[0][0], target_cross_x], [ring.center[0][1], 0.0], color='gray', linewidth=0.5))
       plt.xlim([-N - 1.5, target_cross_x + 1.5])
 
   DA_theorem = theorem_4_3_formula(N)
@@ -141,37 +177,35 @@ def draw_match(N):
   '''
   Draw the matching line only
   '''
+  plt = pyplot()
+  from matplotlib.lines import Line2D
   placement_center = (0.0, 0.0)
-  centers = find_lighthouse_centers(N, placement_center)
-  lighthouses = []
-  for c in centers:
-    left, mid, right = find_lighthouse_illum_points(N, c, placement_center)
-    lighthouses.append({"center": c, "left": left, "middle": mid, "right": right})
+  ring = LighthouseRing(N, placement_center)
 
   # plots
   fig = plt.figure()
   ax = plt.axes()
   ax.scatter(placement_center[0], placement_center[1], color="red")
-  for l in lighthouses:
-    ax.add_patch(plt.Circle(l['center'], 1.0, color='black', fill=False))
-    ax.scatter(l['center'][0], l['center'][1], color="yellow")
-    ax.scatter(l['left'][0], l['left'][1], color="gray")
-    ax.scatter(l['right'][0], l['right'][1], color="gray")
-    ax.scatter(l['middle'][0], l['middle'][1], color="gray")
+  for center, left, mid, right in ring.points:
+    ax.add_patch(plt.Circle(center, 1.0, color='black', fill=False))
+    ax.scatter(center[0], center[1], color="yellow")
+    ax.scatter(left[0], left[1], color="gray")
+    ax.scatter(right[0], right[1], color="gray")
+    ax.scatter(mid[0], mid[1], color="gray")
     ax.add_line(
-        Line2D([l['center'][0], placement_center[0]], [l['center'][1], placement_center[1]],
+        Line2D([center[0], placement_center[0]], [center[1], placement_center[1]],
                linestyle='--',
                color='gray',
                linewidth=0.4))
-    ax.add_line(Line2D([l['center'][0], l['left'][0]], [l['center'][1], l['left'][1]], color='gray', linewidth=0.5))
-    ax.add_line(Line2D([l['center'][0], l['right'][0]], [l['center'][1], l['right'][1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], left[0]], [center[1], left[1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], right[0]], [center[1], right[1]], color='gray', linewidth=0.5))
 
   plt.xlim([-N - 1.5, N + 1.5])
   plt.ylim([-N - 1.5, N + 1.5])
   if N == 1:
     DA = 0
   else:
-    source, tangent, illumline = get_first_illumination_line(lighthouses, placement_center)
+    source, tangent, illumline = get_first_illumination_line(ring, placement_center)
     ax.add_line(illumline)
     ax.scatter(source[0], source[1], color="green")
     ax.scatter(tangent[0], tangent[1], color="green")
@@ -180,17 +214,10 @@ def draw_match(N):
       DA = inf
     else:
       # We can find the dark area
-      coeff = np.polyfit([tangent[0], source[0]], [tangent[1], source[1]],
-                         1)  # finds the coefficients of y = ax + b for points x, y.
-      target_cross_x = -coeff[1] / coeff[0]  # we look for 0 = ax' + b --> x = -b/a
+      target_cross_x, x, DA = find_crossing(N, source, tangent)  # x is the nugget, and DA is by Theorem 4.3
       ax.scatter(target_cross_x, 0.0, color="orange")
       ax.add_line(Line2D([tangent[0], target_cross_x], [tangent[1], 0.0], color='gray', linewidth=0.5))
-      ax.add_line(
-          Line2D([lighthouses[0]['center'][0], target_cross_x], [lighthouses[0]['center'][1], 0.0],
-                 color='gray',
-                 linewidth=0.5))
-      x = dist_2d((target_cross_x, 0.0), tangent)  # this is the nugget, we can find the dark area from this.
-      DA = N * (x - np.arctan(x))  # Theorem 4.3
+      ax.add_line(Line2D([ring.center[0][0], target_cross_x], [ring.center[0][1], 0.0], color='gray', linewidth=0.5))
       plt.xlim([-N - 1.5, target_cross_x + 1.5])
 
   DA_theorem = theorem_4_3_formula(N)
@@ -202,43 +229,128 @@ def draw_match(N):
   return DA, DA_theorem
 
 
-def compute_darkness(N, print_res=True):
+def solve_darkness(N, cross_check=False, mode='float64', guess=None, config=None):
+  """
+  Find the dark area of N lighthouses, along with how it was found. The ring has the shape of config (a RingConfig for
+  N lighthouses), or the one of the paper if None.
+
+  The search runs in float64, and the winning illumination line is then re-evaluated in the numeric mode (one of
+  precision.MODES, see precision.refine). The search starts from the guess for the source index, if given.
+
+  Returns the dark area, the index of the source lighthouse, the tangent point and the x where the illumination line
+  crosses the x axis. These are -1 or nan where they do not apply.
+  """
   if N == 1:
-    DA = 0
-  else:
-    placement_center = (0.0, 0.0)
-    centers = find_lighthouse_centers(N, placement_center)
-    lighthouses = []
-    for c in centers:
-      left, mid, right = find_lighthouse_illum_points(N, c, placement_center)
-      lighthouses.append({"center": c, "left": left, "middle": mid, "right": right})
-    source, tangent, _ = get_first_illumination_line(lighthouses, placement_center)
-    if source[1] <= tangent[1]:
-      # The dark area is infinite
-      DA = inf
-    else:
-      # We can find the dark area
-      coeff = np.polyfit([tangent[0], source[0]], [tangent[1], source[1]],
-                         1)  # finds the coefficients of y = ax + b for points x, y.
-      target_cross_x = -coeff[1] / coeff[0]  # we look for 0 = ax' + b --> x = -b/a
-      x = dist_2d((target_cross_x, 0.0), tangent)  # this is the nugget, we can find the dark area from this.
-      DA = N * (x - np.arctan(x))  # Theorem 4.3
+    return 0, -1, (np.nan, np.nan), np.nan
+  placement_center = (0.0, 0.0)
+  # the search reads a few lighthouses, but the linear scan of cross_check reads the whole upper half
+  ring = LighthouseRing(N, placement_center, half=True, config=config, lazy=not cross_check)
+  i = find_source(ring, placement_center, cross_check, guess)
+  source = ring.center[i]
+  tangent = find_tangent(source, ring.center[0], ring.config.r)
+  # infinite if the tangent is above the source
+  target_cross_x, _, DA = find_crossing(N, source, tangent, ring.config.r)
+  return refine(N, i, 'center', mode, (DA, i, tangent, target_cross_x), config=config)
 
-  DA_theorem = theorem_4_3_formula(N)
+
+def compute_darkness(N, print_res=True, cross_check=False, cache=None, mode='float64'):
+  """
+  Dark area of N lighthouses, by calculation and by Theorem 4.3, in the given numeric mode.
+
+  If a DarknessCache is given, the calculation is looked up there first, and stored there otherwise.
+  """
+  record = cache.get(1, N, mode) if cache is not None else None
+  if record is None:
+    record = solve_darkness(N, cross_check, mode)
+    if cache is not None:
+      cache.put(1, N, record, mode)
+  DA = record[0]
+
+  DA_theorem = theorem_4_3_formula(N, mode)
   if print_res:
     print("D(" + str(N) + ") by Calculation:", DA)
     print("D(" + str(N) + ") by Theorem:", DA_theorem)
   return DA, DA_theorem
 
 
+def _illumination_batch(N, k, R, r, alpha):
+  """
+  Vectorized check_illumination_line for target lighthouse 0, where source k of N lighthouses, and the ring shape (see
+  RingConfig), are given as arrays.
+
+  Returns the validity mask, the source centers and the tangent points.
+  """
+  theta = 2 * np.pi * k / N
+  S = np.stack([R * np.cos(theta), R * np.sin(theta)], axis=-1)
+  T = np.stack([R, np.zeros_like(R)], axis=-1)
+  tang = rotate_batch(S, T, rotation_matrix(np.arcsin(r / dist_2d_batch(S, T))))
+  angle = angle_2d_batch((0.0, 0.0), S, tang)
+  return angle <= np.radians(alpha) / 2, S, tang
+
+
+def theorem_4_3_formula_batch(Ns):
+  """
+  Vectorized theorem_4_3_formula over an array of lighthouse counts.
+  """
+  N = np.asarray(Ns, dtype=float)
+  PI = np.pi
+  with np.errstate(divide='ignore', invalid='ignore'):
+    x = (np.sqrt(4 * N * N * (np.cos(PI / (2 * N)**2)) - 1) + 2 * N * N * np.sin(PI / N) *
+         (np.cos(PI / (2 * N))**2)) / (N * N * (np.sin(PI / N)**2) - 1)
+    DA = N * (x - np.arctan(x))
+  DA = np.where(N % 2 == 0, inf, DA)
+  return np.where(N == 1, 0.0, DA)
+
+
+def compute_darkness_batch(Ns, R=None, r=1.0, alpha=None):
+  """
+  Vectorized compute_darkness over an array of lighthouse counts, without building any lighthouses.
+
+  The ring shape can be given too, as arrays broadcast against Ns (see broadcast_configs), so a whole grid of ring
+  configurations is evaluated in one call.
+
+  The validity of a source is monotone in its index (invalid near the target, valid afterwards), so the first valid
+  source is found by bisecting all N at once, which takes O(log N) array passes.
+
+  Returns the dark areas, the source indices (-1 for N = 1) and the tangent points as arrays shaped like the grid.
+  Where there is no valid source, the dark area is nan and the source -1.
+  """
+  Ns, R, r, alpha = broadcast_configs(Ns, R, r, alpha)
+  shape = Ns.shape
+  Ns, R, r, alpha = Ns.ravel(), R.ravel(), r.ravel(), alpha.ravel()
+  DA = np.zeros(len(Ns))
+  sources = np.full(len(Ns), -1, dtype=np.int64)
+  tangents = np.full((len(Ns), 2), np.nan)
+  multi = np.flatnonzero(Ns > 1)
+  if len(multi) > 0:
+    N, R, r, alpha = Ns[multi], R[multi], r[multi], alpha[multi]
+    lo, hi = np.ones_like(N), N // 2
+    active = lo < hi
+    while active.any():
+      mid = (lo[active] + hi[active]) // 2
+      isValid, _, _ = _illumination_batch(N[active], mid, R[active], r[active], alpha[active])
+      hi[active] = np.where(isValid, mid, hi[active])
+      lo[active] = np.where(isValid, lo[active], mid + 1)
+      active = lo < hi
+    isValid, source, tangent = _illumination_batch(N, lo, R, r, alpha)
+
+    _, _, DA[multi] = find_crossing(N, source, tangent, r)  # infinite where the tangent is above the source
+    DA[multi[~isValid]] = np.nan
+    sources[multi] = np.where(isValid, lo, -1)
+    tangents[multi] = np.where(isValid[:, None], tangent, np.nan)
+  return DA.reshape(shape), sources.reshape(shape), tangents.reshape(shape + (2,))
+
+
 def plot_results(maxL):
   '''
   Plotting code from the notebook. Plot the results upto a given number of lighthouses.
 
   It does not include even numbers in the plot, as they are known to be inf.
   '''
+  plt = pyplot()
   N_L = range(1, maxL + 1)
-  DA, DA_theorem = zip(*[compute_darkness(N, print_res=False) for N in N_L])
+  DA, _, _ = compute_darkness_batch(N_L)
+  DA_theorem = theorem_4_3_formula_batch(N_L)
   fig = plt.figure()
   ax = plt.axes()
   ax.scatter(N_L[::2], DA_theorem[::2], c='green')
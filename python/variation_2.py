@@ -1,11 +1,9 @@
 from math import inf
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import rcParams
-from matplotlib.lines import Line2D
 
-rcParams.update({'figure.autolayout': True})
-from util import rotate, dist_2d, angle_2d, find_lighthouse_centers, find_lighthouse_illum_points
+from util import pyplot, illumination_line, rotate, dist_2d, angle_2d_batch, rotate_batch, rotation_matrix, \
+    dist_2d_batch, LighthouseRing, bisect_first_valid, find_crossing, IncrementalSolver, broadcast_configs
+from precision import refine
 
 
 def checkCollision(x1, y1, x2, y2, cx, cy, r):
@@ -32,92 +30,189 @@ def checkCollision(x1, y1, x2, y2, cx, cy, r):
     return False
 
 
-def find_tangent(LL_s, LC_t):
+def checkCollisions(x1, y1, x2, y2, cx, cy, r):
   """
-  Given a source point and target lighthouse center with radius 1, find the tangent. 
+  Vectorized checkCollision: cx and cy are arrays of circle centers, and a boolean array is returned.
+  """
+  a = y1 - y2
+  b = x2 - x1
+  c = -(b * y1 + a * x1)
+  dist = np.abs(a * np.asarray(cx) + b * np.asarray(cy) + c) / np.sqrt(a * a + b * b)
+  return r > dist  # tangent lines do not count as collisions
+
+
+def find_collision_candidates(N, PC, p1, p2, lo, hi, r=1.0, R=None):
+  """
+  Find the indices in [lo, hi] of the lighthouses on the ring that the line through p1 and p2 may collide with.
+
+  Lighthouse j is centered at angle j * alpha on the circle of radius R (N by default) around PC. The signed distance
+  of such a center to the line is R * cos(theta - psi) + c, where psi is the angle of the line normal, so the colliding
+  centers lie in (at most) two arcs of the ring. These arcs are widened by one lighthouse on each side to absorb
+  rounding, so the result is a superset of the lighthouses that checkCollision would report.
+  """
+  a = p1[1] - p2[1]
+  b = p2[0] - p1[0]
+  norm = np.sqrt(a * a + b * b)
+  c = (a * PC[0] + b * PC[1] - (b * p1[1] + a * p1[0])) / norm
+  psi = np.arctan2(b, a)
+  R = N if R is None else R
+  cos_lo, cos_hi = (-r - c) / R, (r - c) / R
+  if cos_hi < -1 or cos_lo > 1:
+    return np.empty(0, dtype=int)
+  near, far = np.arccos(min(cos_hi, 1.0)), np.arccos(max(cos_lo, -1.0))
+  alpha = 2 * np.pi / N
+  candidates = []
+  for start, end in [(psi + near, psi + far), (psi - far, psi - near)]:
+    candidates.append(np.arange(int(np.floor(start / alpha)) - 1, int(np.ceil(end / alpha)) + 2) % N)
+  candidates = np.unique(np.concatenate(candidates))
+  return candidates[(candidates >= lo) & (candidates <= hi)]
+
+
+def find_tangent(LL_s, LC_t, r=1.0):
+  """
+  Given a source point and target lighthouse center with radius r, find the tangent. 
   
   This is done by first finding the angle between LC_t, LL_s, tang and then calculating the tang itself via rotation. LL is "Lighthouse->Left". 
   It is possible that the angle between the supposed 
   """
-  return rotate(LL_s, LC_t, np.arcsin(1 / dist_2d(LL_s, LC_t)))
+  return rotate(LL_s, LC_t, np.arcsin(r / dist_2d(LL_s, LC_t)))
 
 
-def get_illumination_line(lighthouses_between, LC_s, LL_s, LC_t):
+def check_illumination_line(centers_between, LC_s, LL_s, LC_t, r=1.0, tang=None):
   """
-  Draws the illumination line from a source lighthouse to target lighthouse (variation 2: source point of light)
+  Test the illumination line from a source lighthouse to target lighthouse (variation 2: source point of light), for
+  lighthouses of radius r. The tangent is found here unless the caller already has it.
 
-  Returns a boolean that shows whether it is a valid line, the tangent point, and a Line2D object to draw.
+  Returns a boolean that shows whether it is a valid line, and the tangent point.
   """
-  tang = find_tangent(LL_s, LC_t)
+  if tang is None:
+    tang = find_tangent(LL_s, LC_t, r)
 
-  if angle_2d(tang, LL_s, LC_s) < 90:
+  if angle_2d_batch(tang, LL_s, LC_s) < np.pi / 2:
     # if angle LC_s, LL_s, tang angle is less than 90 its a problem at the source
-    return False, tang, Line2D([LL_s[0], tang[0]], [LL_s[1], tang[1]], color='red', linestyle="--", linewidth=0.5)
+    return False, tang
   else:
     # source is okay, see if it collides with anything in between
-    for lighthouse in lighthouses_between:
-      if checkCollision(LL_s[0], LL_s[1], tang[0], tang[1], lighthouse['center'][0], lighthouse['center'][1], 1.0):
-        return False, tang, Line2D([LL_s[0], tang[0]], [LL_s[1], tang[1]], color='red', linestyle="--", linewidth=0.5)
+    if len(centers_between) > 0:
+      if checkCollisions(LL_s[0], LL_s[1], tang[0], tang[1], centers_between[:, 0], centers_between[:, 1], r).any():
+        return False, tang
 
     # no collisions
-    return True, tang, Line2D([LL_s[0], tang[0]], [LL_s[1], tang[1]], color='green', linewidth=0.5)
+    return True, tang
 
 
-def get_first_illumination_line(lighthouses):
+def get_illumination_line(centers_between, LC_s, LL_s, LC_t, r=1.0, tang=None):
   """
-  Finds the first valid illumination line in second variation. 
+  Draws the illumination line from a source lighthouse to target lighthouse (variation 2: source point of light), for
+  lighthouses of radius r.
+
+  Returns a boolean that shows whether it is a valid line, the tangent point, and a Line2D object to draw.
   """
-  target = lighthouses[0]
-  cur = 1
-  for source in lighthouses[1:int(len(lighthouses) / 2) + 1]:
-    isValid, tang, line = get_illumination_line(lighthouses[1:cur], source['center'], source['left'], target['center'])
+  isValid, tang = check_illumination_line(centers_between, LC_s, LL_s, LC_t, r, tang)
+  return isValid, tang, illumination_line(LL_s, tang, isValid)
+
+
+def scan_first_illumination_line(ring):
+  """
+  Linear search for the first valid source in second variation.
+
+  Returns the index of the source lighthouse, or None if there is no valid line.
+  """
+  for cur in range(1, int(len(ring) / 2) + 1):
+    isValid, _ = check_illumination_line(ring.center[1:cur], ring.center[cur], ring.left[cur], ring.center[0],
+                                         ring.config.r)
     if isValid:
-      return source['left'], tang, line
-    cur += 1
-  raise Exception("No valid illuminations!")  # we dont expect this to happen (but maybe it is possible :o)
+      return cur
+  return None
+
+
+def find_source(ring, cross_check=False, guess=None):
+  """
+  Find the index of the source lighthouse, the first one whose left edge can draw a valid line to the target.
+
+  Both the angle at the source and the absence of collisions only improve as the source gets further away, so the
+  search is a bisection. The immediate neighbor is the exception, as there is nothing in between for it to collide
+  with (e.g. N = 19), so it is tested on its own first. The bisection starts from the guess if there is one (see
+  bisect_first_valid). If cross_check is set, the answer is compared against the linear scan.
+
+  Only the lighthouses in between that can come near the line (see find_collision_candidates) are tested for collision.
+  """
+
+  def is_valid(cur):
+    tang = find_tangent(ring.left[cur], ring.center[0], ring.config.r)
+    return check_illumination_line(centers_between(ring, cur, tang), ring.center[cur], ring.left[cur], ring.center[0],
+                                   ring.config.r, tang)[0]
+
+  N_half = int(len(ring) / 2)
+  cur = 1 if N_half >= 1 and is_valid(1) else bisect_first_valid(is_valid, 2, N_half, guess)
+  if cross_check and cur != scan_first_illumination_line(ring):
+    raise Exception("Bisection and linear scan disagree on the source lighthouse!")
+  if cur is None:
+    raise Exception("No valid illuminations!")  # we dont expect this to happen (but maybe it is possible :o)
+  return cur
+
+
+def centers_between(ring, cur, tang=None):
+  """
+  Centers of the lighthouses between the target and source cur that may collide with the illumination line, whose
+  tangent point is found here unless it is given.
+  """
+  config = ring.config
+  if tang is None:
+    tang = find_tangent(ring.left[cur], ring.center[0], config.r)
+  return ring.center[find_collision_candidates(len(ring), ring.PC, ring.left[cur], tang, 1, cur - 1, config.r,
+                                               config.R)]
+
+
+def get_first_illumination_line(ring, cross_check=False):
+  """
+  Finds the first valid illumination line in second variation. 
+  """
+  cur = find_source(ring, cross_check)
+  tang = find_tangent(ring.left[cur], ring.center[0], ring.config.r)
+  _, tang, line = get_illumination_line(centers_between(ring, cur, tang), ring.center[cur], ring.left[cur],
+                                        ring.center[0], ring.config.r, tang)
+  return ring.left[cur], tang, line
 
 
 def draw_all(N):
   '''
   Draw all lines until a match.
   '''
+  plt = pyplot()
+  from matplotlib.lines import Line2D
   placement_center = (0.0, 0.0)
-  centers = find_lighthouse_centers(N, placement_center)
-  lighthouses = []
-  for c in centers:
-    left, mid, right = find_lighthouse_illum_points(N, c, placement_center)
-    lighthouses.append({"center": c, "left": left, "middle": mid, "right": right})
+  ring = LighthouseRing(N, placement_center)
 
   # plots
   fig = plt.figure()
   ax = plt.axes()
 
   ax.scatter(placement_center[0], placement_center[1], color="red")
-  for l in lighthouses:
-    ax.add_patch(plt.Circle(l['center'], 1.0, color='black', fill=False))
-    ax.scatter(l['center'][0], l['center'][1], color="yellow")
-    ax.scatter(l['left'][0], l['left'][1], color="gray")
-    ax.scatter(l['right'][0], l['right'][1], color="gray")
-    ax.scatter(l['middle'][0], l['middle'][1], color="gray")
+  for center, left, mid, right in ring.points:
+    ax.add_patch(plt.Circle(center, 1.0, color='black', fill=False))
+    ax.scatter(center[0], center[1], color="yellow")
+    ax.scatter(left[0], left[1], color="gray")
+    ax.scatter(right[0], right[1], color="gray")
+    ax.scatter(mid[0], mid[1], color="gray")
     ax.add_line(
-        Line2D([l['center'][0], placement_center[0]], [l['center'][1], placement_center[1]],
+        Line2D([center[0], placement_center[0]], [center[1], placement_center[1]],
                linestyle='--',
                color='gray',
                linewidth=0.4))
-    ax.add_line(Line2D([l['center'][0], l['left'][0]], [l['center'][1], l['left'][1]], color='gray', linewidth=0.5))
-    ax.add_line(Line2D([l['center'][0], l['right'][0]], [l['center'][1], l['right'][1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], left[0]], [center[1], left[1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], right[0]], [center[1], right[1]], color='gray', linewidth=0.5))
 
-  target = lighthouses[0]
   cur = 1
-  for source in lighthouses[1:int(len(lighthouses) / 2) + 1]:
-    isValid, tang, line = get_illumination_line(lighthouses[1:cur], source['center'], source['left'], target['center'])
+  for source in ring.left[1:int(N / 2) + 1]:
+    isValid, tang, line = get_illumination_line(ring.center[1:cur], ring.center[cur], source, ring.center[0])
     ax.add_line(line)
     if isValid:
-      ax.scatter(source['left'][0], source['left'][1], color="green")
+      ax.scatter(source[0], source[1], color="green")
       ax.scatter(tang[0], tang[1], color="green")
       break
     else:
-      ax.scatter(source['left'][0], source['left'][1], color="red")
+      ax.scatter(source[0], source[1], color="red")
       ax.scatter(tang[0], tang[1], color="red")
     cur += 1
 
@@ -128,17 +223,10 @@ def draw_all(N):
     DA = inf
   else:
     # We can find the dark area
-    coeff = np.polyfit([tang[0], source['left'][0]], [tang[1], source['left'][1]],
-                       1)  # finds the coefficients of y = ax + b for points x, y.
-    target_cross_x = -coeff[1] / coeff[0]  # we look for 0 = ax' + b --> x = -b/a
+    target_cross_x, x, DA = find_crossing(N, source, tang)  # x is the nugget, and DA is by Theorem 4.3
     ax.scatter(target_cross_x, 0.0, color="orange")
     ax.add_line(Line2D([tang[0], target_cross_x], [tang[1], 0.0], color='gray', linewidth=0.5))
-    ax.add_line(
-        Line2D([lighthouses[0]['center'][0], target_cross_x], [lighthouses[0]['center'][1], 0.0],
-               color='gray',
-               linewidth=0.5))
-    x = dist_2d((target_cross_x, 0.0), tang)  # this is the nugget, we can find the dark area from this.
-    DA = N * (x - np.arctan(x))  # Theorem 4.3
+    ax.add_line(Line2D([ring.center[0][0], target_cross_x], [ring.center[0][1], 0.0], color='gray', linewidth=0.5))
     plt.xlim([-N - 1.5, target_cross_x + 1.5])
   plt.ylim([-N - 1.5, N + 1.5])
 
@@ -153,32 +241,30 @@ def draw_match(N):
   '''
   Draw the matching line only
   '''
+  plt = pyplot()
+  from matplotlib.lines import Line2D
   placement_center = (0.0, 0.0)
-  centers = find_lighthouse_centers(N, placement_center)
-  lighthouses = []
-  for c in centers:
-    left, mid, right = find_lighthouse_illum_points(N, c, placement_center)
-    lighthouses.append({"center": c, "left": left, "middle": mid, "right": right})
+  ring = LighthouseRing(N, placement_center)
 
   # plots
   fig = plt.figure()
   ax = plt.axes()
   ax.scatter(placement_center[0], placement_center[1], color="red")
-  for l in lighthouses:
-    ax.add_patch(plt.Circle(l['center'], 1.0, color='black', fill=False))
-    ax.scatter(l['center'][0], l['center'][1], color="yellow")
-    ax.scatter(l['left'][0], l['left'][1], color="gray")
-    ax.scatter(l['right'][0], l['right'][1], color="gray")
-    ax.scatter(l['middle'][0], l['middle'][1], color="gray")
+  for center, left, mid, right in ring.points:
+    ax.add_patch(plt.Circle(center, 1.0, color='black', fill=False))
+    ax.scatter(center[0], center[1], color="yellow")
+    ax.scatter(left[0], left[1], color="gray")
+    ax.scatter(right[0], right[1], color="gray")
+    ax.scatter(mid[0], mid[1], color="gray")
     ax.add_line(
-        Line2D([l['center'][0], placement_center[0]], [l['center'][1], placement_center[1]],
+        Line2D([center[0], placement_center[0]], [center[1], placement_center[1]],
                linestyle='--',
                color='gray',
                linewidth=0.4))
-    ax.add_line(Line2D([l['center'][0], l['left'][0]], [l['center'][1], l['left'][1]], color='gray', linewidth=0.5))
-    ax.add_line(Line2D([l['center'][0], l['right'][0]], [l['center'][1], l['right'][1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], left[0]], [center[1], left[1]], color='gray', linewidth=0.5))
+    ax.add_line(Line2D([center[0], right[0]], [center[1], right[1]], color='gray', linewidth=0.5))
 
-  source, tang, illumline = get_first_illumination_line(lighthouses)
+  source, tang, illumline = get_first_illumination_line(ring)
   ax.add_line(illumline)
   ax.scatter(source[0], source[1], color="green")
   ax.scatter(tang[0], tang[1], color="green")
@@ -191,17 +277,10 @@ def draw_match(N):
     DA = inf
   else:
     # We can find the dark area
-    coeff = np.polyfit([tang[0], source[0]], [tang[1], source[1]],
-                       1)  # finds the coefficients of y = ax + b for points x, y.
-    target_cross_x = -coeff[1] / coeff[0]  # we look for 0 = ax' + b --> x = -b/a
+    target_cross_x, x, DA = find_crossing(N, source, tang)  # x is the nugget, and DA is by Theorem 4.3
     ax.scatter(target_cross_x, 0.0, color="orange")
     ax.add_line(Line2D([tang[0], target_cross_x], [tang[1], 0.0], color='gray', linewidth=0.5))
-    ax.add_line(
-        Line2D([lighthouses[0]['center'][0], target_cross_x], [lighthouses[0]['center'][1], 0.0],
-               color='gray',
-               linewidth=0.5))
-    x = dist_2d((target_cross_x, 0.0), tang)  # this is the nugget, we can find the dark area from this.
-    DA = N * (x - np.arctan(x))  # Theorem 4.3
+    ax.add_line(Line2D([ring.center[0][0], target_cross_x], [ring.center[0][1], 0.0], color='gray', linewidth=0.5))
     plt.xlim([-N - 1.5, target_cross_x + 1.5])
 
   print("D(" + str(N) + ") by Calculation:", DA)
@@ -213,38 +292,132 @@ def draw_match(N):
   return DA
 
 
-def compute_darkness(N, print_res=True):
+def solve_darkness(N, cross_check=False, mode='float64', guess=None, config=None):
+  """
+  Find the dark area of N lighthouses, along with how it was found. The ring has the shape of config (a RingConfig for
+  N lighthouses), or the one of the paper if None.
+
+  The search runs in float64, and the winning illumination line is then re-evaluated in the numeric mode (one of
+  precision.MODES, see precision.refine). The search starts from the guess for the source index, if given.
+
+  Returns the dark area, the index of the source lighthouse, the tangent point and the x where the illumination line
+  crosses the x axis. These are -1 or nan where they do not apply.
+  """
   if N == 1:
-    DA = 0
+    return 0, -1, (np.nan, np.nan), np.nan
   elif N == 2:
-    DA = inf
-  else:
-    placement_center = (0.0, 0.0)
-    centers = find_lighthouse_centers(N, placement_center)
-    lighthouses = []
-    for c in centers:
-      left, mid, right = find_lighthouse_illum_points(N, c, placement_center)
-      lighthouses.append({"center": c, "left": left, "middle": mid, "right": right})
+    return inf, -1, (np.nan, np.nan), np.nan
+  placement_center = (0.0, 0.0)
+  # the search reads a few lighthouses, but the linear scan of cross_check reads the whole upper half
+  ring = LighthouseRing(N, placement_center, half=True, config=config, lazy=not cross_check)
+  cur = find_source(ring, cross_check, guess)
+  source = ring.left[cur]
+  tang = find_tangent(source, ring.center[0], ring.config.r)
 
-    source, tang, _ = get_first_illumination_line(lighthouses)
+  # We can find the dark area
+  target_cross_x, _, DA = find_crossing(N, source, tang, ring.config.r)  # Theorem 4.3
+  return refine(N, cur, 'left', mode, (DA, cur, tang, target_cross_x), config=config)
 
-    # We can find the dark area
-    coeff = np.polyfit([tang[0], source[0]], [tang[1], source[1]],
-                       1)  # finds the coefficients of y = ax + b for points x, y.
-    target_cross_x = -coeff[1] / coeff[0]  # we look for 0 = ax' + b --> x = -b/a
-    x = dist_2d((target_cross_x, 0.0), tang)  # this is the nugget, we can find the dark area from this.
-    DA = N * (x - np.arctan(x))  # Theorem 4.3
+
+def compute_darkness(N, print_res=True, cross_check=False, cache=None, mode='float64'):
+  """
+  Dark area of N lighthouses, in the given numeric mode.
+
+  If a DarknessCache is given, the calculation is looked up there first, and stored there otherwise.
+  """
+  record = cache.get(2, N, mode) if cache is not None else None
+  if record is None:
+    record = solve_darkness(N, cross_check, mode)
+    if cache is not None:
+      cache.put(2, N, record, mode)
+  DA = record[0]
   if print_res:
     print("D(" + str(N) + ") by Calculation:", DA)
   return DA
 
 
+def _illumination_batch(N, k, R, r, alpha):
+  """
+  Vectorized check_illumination_line for target lighthouse 0, where source k of N lighthouses, and the ring shape (see
+  RingConfig), are given as arrays.
+
+  As in find_collision_candidates, the centers that the line collides with lie in (at most) two arcs of the ring, so a
+  source is blocked if one of the indices 1 to k - 1 falls inside one of them.
+
+  Returns the validity mask, the left illumination points of the sources and the tangent points.
+  """
+  beta = 2 * np.pi / N
+  C = np.stack([R * np.cos(beta * k), R * np.sin(beta * k)], axis=-1)
+  L = rotate_batch(C, (R - r)[:, None] * C / R[:, None], rotation_matrix(np.radians(alpha) / 2))  # as in LighthouseRing
+  T = np.stack([R, np.zeros_like(R)], axis=-1)
+  tang = rotate_batch(L, T, rotation_matrix(np.arcsin(r / dist_2d_batch(L, T))))
+  angle = angle_2d_batch(tang, L, C)
+
+  a = L[:, 1] - tang[:, 1]
+  b = tang[:, 0] - L[:, 0]
+  c = -(b * L[:, 1] + a * L[:, 0]) / np.sqrt(a * a + b * b)
+  psi = np.arctan2(b, a)
+  cos_lo, cos_hi = (-r - c) / R, (r - c) / R
+  near, far = np.arccos(np.clip(cos_hi, -1, 1)), np.arccos(np.clip(cos_lo, -1, 1))
+  blocked = np.zeros(len(N), dtype=bool)
+  for start, end in [(psi + near, psi + far), (psi - far, psi - near)]:
+    for shift in (-N, 0, N):
+      first = np.maximum(np.floor(start / beta + shift) + 1, 1)
+      last = np.minimum(np.ceil(end / beta + shift) - 1, k - 1)
+      blocked |= first <= last
+  blocked &= (cos_hi >= -1) & (cos_lo <= 1)
+  return (angle >= np.pi / 2) & ~blocked, L, tang
+
+
+def compute_darkness_batch(Ns, R=None, r=1.0, alpha=None):
+  """
+  Vectorized compute_darkness over an array of lighthouse counts, without building any lighthouses.
+
+  The ring shape can be given too, as arrays broadcast against Ns (see broadcast_configs), so a whole grid of ring
+  configurations is evaluated in one call.
+
+  As in find_source, the immediate neighbor is tested first, and otherwise the first valid source is found by
+  bisecting all N at once, which takes O(log N) array passes.
+
+  Returns the dark areas, the source indices (-1 for N = 1 and 2) and the tangent points as arrays shaped like the
+  grid. Where there is no valid source, the dark area is nan and the source -1.
+  """
+  Ns, R, r, alpha = broadcast_configs(Ns, R, r, alpha)
+  shape = Ns.shape
+  Ns, R, r, alpha = Ns.ravel(), R.ravel(), r.ravel(), alpha.ravel()
+  DA = np.where(Ns == 2, inf, 0.0)
+  sources = np.full(len(Ns), -1, dtype=np.int64)
+  tangents = np.full((len(Ns), 2), np.nan)
+  multi = np.flatnonzero(Ns > 2)
+  if len(multi) > 0:
+    N, R, r, alpha = Ns[multi], R[multi], r[multi], alpha[multi]
+    neighbor, _, _ = _illumination_batch(N, np.ones_like(N), R, r, alpha)
+    lo, hi = np.where(neighbor, 1, 2), np.where(neighbor, 1, N // 2)
+    active = lo < hi
+    while active.any():
+      mid = (lo[active] + hi[active]) // 2
+      isValid, _, _ = _illumination_batch(N[active], mid, R[active], r[active], alpha[active])
+      hi[active] = np.where(isValid, mid, hi[active])
+      lo[active] = np.where(isValid, lo[active], mid + 1)
+      active = lo < hi
+    isValid, source, tangent = _illumination_batch(N, lo, R, r, alpha)
+    isValid &= lo <= N // 2
+
+    _, _, DA[multi] = find_crossing(N, source, tangent, r)
+    DA[multi[~isValid]] = np.nan
+    sources[multi] = np.where(isValid, lo, -1)
+    tangents[multi] = np.where(isValid[:, None], tangent, np.nan)
+  return DA.reshape(shape), sources.reshape(shape), tangents.reshape(shape + (2,))
+
+
 def plot_results(maxL):
   '''
   Plotting code from the notebook. Plot the results upto a given number of lighthouses.
   '''
+  plt = pyplot()
   N_L = range(1, maxL + 1)
-  DA = [compute_darkness(N, print_res=False) for N in N_L]
+  solve = IncrementalSolver(solve_darkness)
+  DA = [solve(N)[0] for N in N_L]
   fig = plt.figure()
   ax = plt.axes()
   ax.scatter(N_L, DA, c='blue')
@@ -0,0 +1,182 @@
+import heapq
+import numpy as np
+
+from util import LighthouseRing, rotate_batch, rotation_matrix, angle_2d_batch, dist_2d_batch
+from ensemble import illumination_points
+import variation_2
+
+
+class VisibilityGraph:
+  """
+  Which sources light which targets in variation 2. Source s reaches target t if the line from the left illumination
+  point of s to its tangent on t passes check_illumination_line, for the sources s = t + 1 to t + N // 2 going
+  counter-clockwise, as in the solver.
+
+  The graph is stored by target, as the offsets s - t of its sources, in increasing order: the offsets of target t are
+  offsets[indptr[t]:indptr[t + 1]]. On a regular ring every target has the same offsets, so only those are stored and
+  indptr is None.
+  """
+  __slots__ = ('N', 'indptr', 'offsets')
+
+  def __init__(self, N, offsets, indptr=None):
+    self.N = N
+    self.offsets = offsets
+    self.indptr = indptr
+
+  def __repr__(self):
+    return "VisibilityGraph(N=" + str(self.N) + ", edges=" + str(self.edge_count) + ")"
+
+  @property
+  def edge_count(self):
+    return self.N * len(self.offsets) if self.indptr is None else len(self.offsets)
+
+  def row(self, t):
+    """
+    The offsets of the sources of target t.
+    """
+    return self.offsets if self.indptr is None else self.offsets[self.indptr[t]:self.indptr[t + 1]]
+
+  def sources(self, t):
+    return (t + self.row(t)) % self.N
+
+  def first_source(self, t=0):
+    """
+    The source found by the solver for target t, the valid one nearest to it, or -1 if there is none.
+    """
+    row = self.row(t)
+    return (t + int(row[0])) % self.N if len(row) > 0 else -1
+
+  def has_edge(self, source, target):
+    row = self.row(target)
+    k = (source - target) % self.N
+    i = np.searchsorted(row, k)
+    return bool(i < len(row) and row[i] == k)
+
+  def to_csr(self):
+    """
+    The graph as explicit compressed sparse rows: the sources of target t are indices[indptr[t]:indptr[t + 1]].
+    """
+    if self.indptr is None:
+      indptr = np.arange(self.N + 1, dtype=np.int64) * len(self.offsets)
+      indices = ((np.arange(self.N)[:, None] + self.offsets[None, :]) % self.N).ravel()
+    else:
+      indptr = self.indptr
+      indices = (np.repeat(np.arange(self.N), np.diff(indptr)) + self.offsets) % self.N
+    return indptr, indices
+
+
+def occluded(start, centers, tangents, r=1.0):
+  """
+  Angular sweep around a source point: centers are the K lighthouses in order of their offset from the source, and
+  tangents the tangent points of the lines from start to each of them. Line k is occluded if any of centers[:k], the
+  lighthouses in between, is closer than r to it. As in checkCollisions, this is the distance to the whole line.
+
+  Lighthouse j blocks the lines whose angle is within arcsin(r / d) of its own, for its distance d from start. Angles
+  are taken modulo pi, as a line goes both ways. The sweep goes over these intervals and the line angles in order,
+  keeping the offsets of the intervals it is in on a heap: a line is occluded if the smallest of them is below its
+  own. This takes O(K log K) instead of O(K^2).
+
+  Returns a boolean array of K.
+  """
+  K = len(centers)
+  d = centers - start
+  beta = np.arctan2(d[:, 1], d[:, 0]) % np.pi
+  distance = np.hypot(d[:, 0], d[:, 1])
+  with np.errstate(divide='ignore'):
+    delta = np.where(distance > r, np.arcsin(np.minimum(r / distance, 1.0)), np.pi)
+  theta = np.arctan2(tangents[:, 1] - start[1], tangents[:, 0] - start[0]) % np.pi
+
+  # (angle, order, kind, offset): at the same angle, open ends come before lines, and open starts after them, so that
+  # a line exactly tangent to a lighthouse is not blocked by it. Intervals wrapping around pi are split in two, and
+  # the piece starting at 0 is closed.
+  END, CLOSED_START, LINE, START = 0, 1, 2, 3
+  events = [(theta[k], LINE, k) for k in range(K)]
+  for j in range(K):
+    lo, hi = beta[j] - delta[j], beta[j] + delta[j]
+    if delta[j] >= np.pi / 2:
+      events.append((0.0, CLOSED_START, j))
+    elif lo < 0:
+      events += [(lo + np.pi, START, j), (0.0, CLOSED_START, j), (hi, END, j)]
+    elif hi > np.pi:
+      events += [(lo, START, j), (0.0, CLOSED_START, j), (hi - np.pi, END, j)]
+    else:
+      events += [(lo, START, j), (hi, END, j)]
+  events.sort()
+
+  blocked = np.zeros(K, dtype=bool)
+  active, ended = [], {}
+  for _, kind, j in events:
+    if kind == LINE:
+      while active and ended.get(active[0], 0) > 0:
+        ended[active[0]] -= 1
+        heapq.heappop(active)
+      blocked[j] = len(active) > 0 and active[0] < j
+    elif kind == END:
+      ended[j] = ended.get(j, 0) + 1
+    else:
+      heapq.heappush(active, j)
+  return blocked
+
+
+def source_row(start, source_center, centers, r=1.0):
+  """
+  The valid offsets of one source, whose light comes from start, to the K lighthouses in order of offset (the targets
+  at offsets 1 to K).
+  """
+  tangents = rotate_batch(start, centers, rotation_matrix(np.arcsin(r / dist_2d_batch(start, centers))))
+  valid = angle_2d_batch(tangents, start, source_center) >= np.pi / 2
+  valid &= ~occluded(start, centers, tangents, r)
+  return np.flatnonzero(valid) + 1
+
+
+def ring_visibility(N, config=None, cross_check=False):
+  """
+  The visibility graph of the regular ring of N lighthouses, of the shape of config (a RingConfig) if given.
+
+  The ring looks the same from every lighthouse, so the offsets are those of lighthouse 0 as a source, lighting the
+  targets N - 1, N - 2, ... clockwise, and only one sweep is needed (see occluded): O(N log N) for the whole graph.
+
+  If cross_check is set, every offset is compared against check_illumination_line from lighthouse k to target 0,
+  which takes O(N^2).
+  """
+  ring = LighthouseRing(N, config=config)
+  r = ring.config.r
+  K = N // 2
+  offsets = source_row(ring.left[0], ring.center[0], ring.center[(-np.arange(1, K + 1)) % N], r)
+  if cross_check:
+    for k in range(1, K + 1):
+      isValid, _ = variation_2.check_illumination_line(ring.center[1:k], ring.center[k], ring.left[k], ring.center[0],
+                                                       r)
+      if isValid != (k in offsets):
+        raise Exception("Sweep and check_illumination_line disagree on source " + str(k) + " of " + str(N) + "!")
+  return VisibilityGraph(N, offsets)
+
+
+def visibility(centers, PC=(0.0, 0.0), r=1.0, alpha=None):
+  """
+  The visibility graph of lighthouses at arbitrary centers (an (N, 2) array, e.g. a member of ensemble.perturb), each
+  facing PC with a light angle of alpha degrees (360 / N by default).
+
+  Without the symmetry of the regular ring, every lighthouse is swept as a source: O(N^2 log N) for the whole graph.
+  """
+  centers = np.asarray(centers, dtype=float)
+  N = len(centers)
+  left, _ = illumination_points(centers, PC, r, alpha)
+  K = N // 2
+  rows = []
+  for s in range(N):
+    # the targets s - k of source s, and their offsets k, which are the offsets s - t of the graph
+    rows.append(source_row(left[s], centers[s], centers[(s - np.arange(1, K + 1)) % N], r))
+  # store by target: source s lights target (s - k) % N at offset k
+  sources = np.concatenate([np.full(len(row), s) for s, row in enumerate(rows)]).astype(np.int64)
+  offsets = np.concatenate(rows).astype(np.int64) if rows else np.empty(0, dtype=np.int64)
+  targets = (sources - offsets) % N
+  order = np.lexsort((offsets, targets))
+  indptr = np.concatenate([[0], np.cumsum(np.bincount(targets, minlength=N))])
+  return VisibilityGraph(N, offsets[order], indptr)
+
+
+if __name__ == "__main__":
+  for N in [9, 19, 20, 21]:
+    graph = ring_visibility(N, cross_check=True)
+    print(graph, "first source:", graph.first_source(), "offsets:", graph.offsets)
@@ -0,0 +1,174 @@
+const { rotate2D } = require("./utils");
+
+// Layout of the files written by python/export.py (see there). Every block
+// starts at a multiple of 8 bytes, so typed arrays are laid over the fetched
+// bytes as they are, without parsing.
+const MAGIC = "LHGEOM";
+const VERSION = 1;
+const HEADER_BYTES = 32;
+const LINE_FIELDS = [
+  "DA",
+  "source",
+  "start_x",
+  "start_y",
+  "tangent_x",
+  "tangent_y",
+  "cross_x",
+];
+const INDEX_FIELDS = ["N", "offset", "length"].concat(
+  LINE_FIELDS.map((field) => field + "_1"),
+  LINE_FIELDS.map((field) => field + "_2")
+);
+
+// Fetch the bytes [start, end) of url.
+// If the server ignores the range, the whole file comes back instead.
+async function fetchRange(url, start, end) {
+  const response = await fetch(url, {
+    headers: { Range: "bytes=" + start + "-" + (end - 1) },
+  });
+  if (!response.ok) {
+    throw new Error("Could not fetch " + url + ": " + response.status);
+  }
+  return {
+    buffer: await response.arrayBuffer(),
+    whole: response.status !== 206,
+  };
+}
+
+// Rings precomputed by python/export.py. Only the header and the index are
+// fetched up front, and the ring of each N the first time it is asked for.
+class PrecomputedGeometry {
+  constructor(url, index, r, buffer) {
+    this.url = url;
+    this.index = index; // rows of INDEX_FIELDS
+    this.r = r; // radius of the lighthouses
+    this.buffer = buffer; // the whole file, if the server sent it all
+    this.rows = new Map(); // N -> row of the index
+    this.rings = new Map(); // N -> lighthouses, once fetched
+    this.pending = new Set();
+    this.onload = null; // called with N when its ring arrives
+    for (let row = 0; row * INDEX_FIELDS.length < index.length; ++row) {
+      this.rows.set(index[row * INDEX_FIELDS.length], row);
+    }
+    this.maxN = Math.max(...this.rows.keys());
+  }
+
+  static async load(url) {
+    const head = await fetchRange(url, 0, HEADER_BYTES);
+    let buffer = head.whole ? head.buffer : null;
+    const magic = String.fromCharCode(
+      ...new Uint8Array(head.buffer, 0, MAGIC.length)
+    );
+    // version, geometry version, count, fields
+    const header = new Uint32Array(head.buffer, 8, 4);
+    if (magic !== MAGIC || header[0] !== VERSION) {
+      throw new Error(url + " is not a geometry file of version " + VERSION);
+    }
+    if (header[3] !== INDEX_FIELDS.length) {
+      throw new Error("Unexpected index layout in " + url);
+    }
+    const r = new Float64Array(head.buffer, 24, 1)[0];
+    const count = header[2] * INDEX_FIELDS.length;
+    let index;
+    if (buffer) {
+      index = new Float64Array(buffer, HEADER_BYTES, count);
+    } else {
+      const range = await fetchRange(
+        url,
+        HEADER_BYTES,
+        HEADER_BYTES + 8 * count
+      );
+      if (range.whole) buffer = range.buffer;
+      index = new Float64Array(
+        range.buffer,
+        range.whole ? HEADER_BYTES : 0,
+        count
+      );
+    }
+    return new PrecomputedGeometry(url, index, r, buffer);
+  }
+
+  has(n, r) {
+    return r === this.r && this.rows.has(n);
+  }
+
+  field(n, name) {
+    return this.index[
+      this.rows.get(n) * INDEX_FIELDS.length + INDEX_FIELDS.indexOf(name)
+    ];
+  }
+
+  // The lighthouses of n, or null if they are not fetched yet. In that case,
+  // they are fetched, and onload is called once they are in.
+  ring(n) {
+    if (this.rings.has(n)) return this.rings.get(n);
+    if (!this.pending.has(n)) {
+      this.pending.add(n);
+      this.fetchRing(n).then((ring) => {
+        this.rings.set(n, ring);
+        this.pending.delete(n);
+        if (this.onload) this.onload(n);
+      });
+    }
+    return null;
+  }
+
+  async fetchRing(n) {
+    const offset = this.field(n, "offset");
+    const length = this.field(n, "length");
+    let points;
+    if (this.buffer) {
+      points = new Float32Array(this.buffer, offset, length / 4);
+    } else {
+      const range = await fetchRange(this.url, offset, offset + length);
+      points = new Float32Array(
+        range.buffer,
+        range.whole ? offset : 0,
+        length / 4
+      );
+    }
+    // Python goes counter-clockwise with y up, and the canvas clockwise with
+    // y down: flipping y gives the points and ids of LighthouseManager.
+    const point = (block, i) => ({
+      x: points[2 * (block * n + i)],
+      y: -points[2 * (block * n + i) + 1],
+    });
+    const Ls = [];
+    for (let i = 0; i < n; ++i) {
+      Ls.push({
+        id: i,
+        r: this.r,
+        lc: point(0, i),
+        left: point(1, i),
+        right: point(2, i),
+      });
+    }
+    return Ls;
+  }
+
+  // Like LighthouseManager.findIlluminations, with only the valid line on
+  // each side, and the dark area at the end.
+  findIlluminations(n, targetID, v, pc = { x: 0, y: 0 }) {
+    const get = (name) => this.field(n, name + "_" + v);
+    const darkArea = get("DA");
+    if (get("source") < 0 || !Number.isFinite(get("cross_x"))) {
+      return [false, null, null, darkArea];
+    }
+    // the line to target 0 and its reflection, turned to the target
+    const a = (-2 * Math.PI * targetID) / n;
+    const place = (x, y) => rotate2D({ x: pc.x + x, y: pc.y + y }, pc, a);
+    const line = (sign) => [
+      {
+        from: place(get("start_x"), sign * get("start_y")),
+        to: place(get("tangent_x"), sign * get("tangent_y")),
+        isValid: true,
+        intersection: place(get("cross_x"), 0),
+      },
+    ];
+    return [true, line(-1), line(1), darkArea];
+  }
+}
+
+module.exports = {
+  PrecomputedGeometry,
+};
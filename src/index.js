@@ -3,6 +3,7 @@ const random = require("canvas-sketch-util/random");
 const math = require("canvas-sketch-util/math");
 const Tweakpane = require("tweakpane");
 const { LighthouseManager, Variation } = require("./lighthouse");
+const { PrecomputedGeometry } = require("./geometry");
 
 const settings = {
   dimensions: [1080, 1080],
@@ -27,6 +28,15 @@ const params = {
 
 let scale;
 
+// rings precomputed by python/export.py, if the file is served
+const GEOMETRY_URL = "geometry.bin";
+let geometry = null;
+
+// largest number of lighthouses computed in the browser: drawing all lines
+// takes about N^2 collision tests, so only the precomputed 'one' and 'none'
+// draw types go past it
+const MAX_COMPUTED = 40;
+
 const sketch = () => {
   return ({ context, width, height }) => {
     params.source = Math.round(
@@ -48,8 +58,15 @@ const sketch = () => {
     context.scale(scale, scale); // scale up
     context.lineWidth = 2 / scale;
 
-    const L = new LighthouseManager(params.lighthouses, params.radius); // create manager
-    L.Ls.forEach((l) => drawLighthouse(context, l)); // draw lighthouses
+    const precomputed =
+      geometry !== null && geometry.has(params.lighthouses, params.radius);
+    // create the manager only if something is computed here
+    let L = null;
+    const manager = () =>
+      L || (L = new LighthouseManager(params.lighthouses, params.radius));
+    const Ls =
+      (precomputed && geometry.ring(params.lighthouses)) || manager().Ls;
+    Ls.forEach((l) => drawLighthouse(context, l)); // draw lighthouses
 
     // placement center
     context.save();
@@ -66,15 +83,21 @@ const sketch = () => {
       // do nothing
     } else if (params.drawType === DrawTypes.ONE) {
       // find the first illuminating ID
-      const [exists, i1, i2] = L.findIlluminations(
-        params.target,
-        params.variation
-      );
+      // (from the precomputed geometry if possible, without searching)
+      const [exists, i1, i2, darkArea] = precomputed
+        ? geometry.findIlluminations(
+            params.lighthouses,
+            params.target,
+            params.variation
+          )
+        : manager().findIlluminations(params.target, params.variation);
       let darkAreaStr = "infinite";
       if (exists) {
         drawIllumination(context, i1);
         drawIllumination(context, i2);
-        darkAreaStr = L.findDarkArea(i1, L.radius).toString(); // i2 or i1 does not matter
+        darkAreaStr = (
+          precomputed ? darkArea : manager().findDarkArea(i1, L.radius)
+        ).toString(); // i2 or i1 does not matter
       }
       context.save();
       // scale back so that text is written normally
@@ -90,14 +113,18 @@ const sketch = () => {
       // draw from source to target chosen by user
       drawIllumination(
         context,
-        L.tryIlluminate(params.source, params.target, params.variation)
+        manager().tryIlluminate(
+          params.source,
+          params.target,
+          params.variation
+        )
       );
     } else if (params.drawType === DrawTypes.ALL) {
       // draw all
       for (let i = 1; i < params.lighthouses; i++) {
         drawIllumination(
           context,
-          L.tryIlluminate(
+          manager().tryIlluminate(
             (params.target + i) % params.lighthouses,
             params.target,
             params.variation
@@ -109,11 +136,23 @@ const sketch = () => {
 };
 
 const createPaneAndStart = async () => {
+  try {
+    geometry = await PrecomputedGeometry.load(GEOMETRY_URL);
+  } catch (e) {
+    geometry = null; // not there, everything is computed here
+  }
   const pane = new Tweakpane.Pane();
   let folder;
 
   folder = pane.addFolder({ title: "lighthouses" });
-  folder.addInput(params, "lighthouses", { min: 2, max: 40, step: 1 });
+  folder.addInput(params, "lighthouses", {
+    min: 2,
+    max:
+      geometry !== null
+        ? Math.max(MAX_COMPUTED, geometry.maxN)
+        : MAX_COMPUTED,
+    step: 1,
+  });
   folder.addInput(params, "source", { min: 0, max: 360, step: 18 });
   folder.addInput(params, "target", { min: 0, max: 360, step: 18 });
   folder.addInput(params, "radius", { min: 0.06, max: 3.14, step: 0.04 });
@@ -132,11 +171,28 @@ const createPaneAndStart = async () => {
 
   const sketchmgr = await canvasSketch(sketch, settings);
 
-  pane.on("change", () => sketchmgr.render());
+  pane.on("change", () => {
+    if (params.lighthouses > MAX_COMPUTED && !fromGeometry()) {
+      params.lighthouses = MAX_COMPUTED; // too many to compute here
+      pane.refresh();
+    }
+    sketchmgr.render();
+  });
+  if (geometry !== null) geometry.onload = () => sketchmgr.render();
 };
 
 createPaneAndStart();
 
+// Whether the current drawing only reads the precomputed geometry, so that
+// the number of lighthouses can go past MAX_COMPUTED
+function fromGeometry() {
+  return (
+    geometry !== null &&
+    geometry.has(params.lighthouses, params.radius) &&
+    (params.drawType === DrawTypes.ONE || params.drawType === DrawTypes.NONE)
+  );
+}
+
 // Draw a lighthouse
 function drawLighthouse(context, l) {
   context.save();